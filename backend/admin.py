@@ -1,17 +1,29 @@
 import os
 import secrets
-from typing import Optional
+from datetime import date, timedelta
+from typing import Any, List, Literal, Optional, Tuple
 
-from fastapi import APIRouter, Depends, Form, HTTPException, Request, status
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi import APIRouter, Depends, Form, HTTPException, Query, Request, status
+from fastapi.responses import HTMLResponse, RedirectResponse, StreamingResponse
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
-from fastapi.templating import Jinja2Templates
-from sqlalchemy.orm import Session
+from sqlalchemy import func, update
+from sqlalchemy.orm import Session, selectinload
+
+from cache import catalog_cache, invalidate_product_documents
+from database import AsyncDB, get_async_db, get_db
+from email_outbox import dispatcher as outbox_dispatcher, queue_emails
+from email_service import email_service
+from models import Batch, Order, OrderStatus, Product
+from orders import (
+    MAX_ORDER_ID,
+    ORDER_SORTS,
+    order_search_condition,
+    paginate_orders,
+    query_orders,
+)
+from reports import ORDER_EXPORT_HEADER, export_order_rows, stream_csv, stream_xlsx
+from templating import templates
 
-from database import get_db
-from models import Order, OrderStatus, Product
-
-templates = Jinja2Templates(directory="templates")
 security = HTTPBasic()
 
 router = APIRouter(prefix="/admin", tags=["admin"])
@@ -84,26 +96,98 @@ def _parse_optional_int(value: Optional[str]) -> Optional[int]:
         )
 
 
+def _parse_date(value: Optional[str]) -> Optional[date]:
+    try:
+        return date.fromisoformat(value) if value else None
+    except ValueError:
+        return None  # ignore invalid filter input
+
+
+def _parse_order_ids(values: List[str]) -> List[int]:
+    """Convert the checked order ids of a bulk form to integers."""
+    order_ids = []
+    for value in values:
+        if not (value.isascii() and value.isdigit() and 0 < int(value) <= MAX_ORDER_ID):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Ongeldige bestelling geselecteerd",
+            )
+        order_ids.append(int(value))
+    return order_ids
+
+
+def _order_filters(
+    status_filter: Optional[str],
+    batch_id: Optional[str],
+    date_from: Optional[str],
+    date_to: Optional[str],
+    q: Optional[str],
+) -> Tuple[List[Any], Optional[OrderStatus], Optional[date], Optional[date]]:
+    """WHERE conditions for the order list filters, plus the parsed values."""
+    conditions = []
+
+    search = order_search_condition(q) if q else None
+    if search is not None:
+        conditions.append(search)
+
+    status_filter_value: Optional[OrderStatus] = None
+    if status_filter:
+        try:
+            status_filter_value = OrderStatus(status_filter)
+            conditions.append(Order.status == status_filter_value)
+        except ValueError:
+            status_filter_value = None  # ignore invalid filter input
+
+    if batch_id:
+        conditions.append(Order.batch_id == batch_id)
+
+    # Both dates are inclusive
+    date_from_value = _parse_date(date_from)
+    if date_from_value:
+        conditions.append(Order.created_at >= date_from_value)
+    date_to_value = _parse_date(date_to)
+    if date_to_value:
+        conditions.append(Order.created_at < date_to_value + timedelta(days=1))
+
+    return conditions, status_filter_value, date_from_value, date_to_value
+
+
 @router.get("/orders", response_class=HTMLResponse)
 def list_orders(
     request: Request,
     status_filter: Optional[str] = None,
-    limit: int = 200,
+    batch_id: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    q: Optional[str] = None,
+    limit: int = Query(200, ge=1, le=500),
+    after: Optional[int] = None,
+    before: Optional[int] = None,
+    sort: str = "newest",
     db: Session = Depends(get_db),
     _: str = Depends(require_admin),
 ):
-    """Render a minimal admin dashboard with recent orders."""
-    query = db.query(Order).order_by(Order.created_at.desc())
+    """Render a minimal admin dashboard with recent orders, paginated."""
+    if sort not in ORDER_SORTS:
+        sort = "newest"  # ignore invalid sort input
+    conditions, status_filter_value, date_from_value, date_to_value = _order_filters(
+        status_filter, batch_id, date_from, date_to, q
+    )
+    query = query_orders(db, "list").filter(*conditions)
 
-    status_filter_value: Optional[OrderStatus] = None
-    if status_filter:
-        try:
-            status_filter_value = OrderStatus(status_filter)
-            query = query.filter(Order.status == status_filter_value)
-        except ValueError:
-            status_filter_value = None  # ignore invalid filter input
+    orders, prev_cursor, next_cursor = paginate_orders(
+        query, limit, after, before, sort
+    )
+    batches = db.query(Batch).order_by(Batch.created_at.desc()).all()
 
-    orders = query.limit(limit).all()
+    page_url = request.url.remove_query_params(
+        ["after", "before", "bulk_updated", "bulk_notified"]
+    )
+    export_params = {
+        key: value
+        for key, value in request.query_params.items()
+        if key in ("status_filter", "batch_id", "date_from", "date_to", "q") and value
+    }
 
     return templates.TemplateResponse(
         "admin/orders.html",
@@ -111,11 +195,171 @@ def list_orders(
             "request": request,
             "orders": orders,
             "status_filter": status_filter_value,
+            "batch_filter": batch_id or "",
+            "date_from": date_from_value,
+            "date_to": date_to_value,
+            "q": q or "",
+            "search_too_short": bool(q and q.strip()) and order_search_condition(q) is None,
+            # Whether "all orders in this filter" differs from all orders
+            "filtered": bool(conditions),
+            "sort": sort,
             "statuses": list(OrderStatus),
+            "batches": batches,
+            "prev_url": (
+                page_url.include_query_params(before=prev_cursor)
+                if prev_cursor is not None
+                else None
+            ),
+            "next_url": (
+                page_url.include_query_params(after=next_cursor)
+                if next_cursor is not None
+                else None
+            ),
+            "export_url": request.url.replace_query_params(**export_params).replace(
+                path="/admin/orders/export"
+            ),
+            "bulk_updated": request.query_params.get("bulk_updated"),
+            "bulk_notified": request.query_params.get("bulk_notified"),
         },
     )
 
 
+@router.get("/orders/export")
+def export_orders(
+    status_filter: Optional[str] = None,
+    batch_id: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    q: Optional[str] = None,
+    output: Literal["csv", "xlsx"] = Query("csv", alias="format"),
+    _: str = Depends(require_admin),
+):
+    """
+    Download orders with one row per order item, as CSV or XLSX.
+
+    Takes the same filters as the order list. Rows are read with a
+    server-side cursor in chunks and written out as they arrive, so memory
+    use does not grow with the number of orders.
+    """
+    conditions, *_ = _order_filters(status_filter, batch_id, date_from, date_to, q)
+    filename = f"bestellingen-{date.today().isoformat()}"
+
+    if output == "xlsx":
+        body = stream_xlsx(ORDER_EXPORT_HEADER, export_order_rows(conditions), "Bestellingen")
+        media_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    else:
+        body = stream_csv(ORDER_EXPORT_HEADER, export_order_rows(conditions))
+        media_type = "text/csv"
+
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}.{output}"'
+        },
+    )
+
+
+@router.post("/orders/bulk-status")
+async def bulk_update_order_status(
+    new_status: OrderStatus = Form(...),
+    scope: str = Form("selected"),
+    order_ids: List[str] = Form([]),
+    batch_id: Optional[str] = Form(None),
+    status_filter: Optional[str] = Form(None),
+    date_from: Optional[str] = Form(None),
+    date_to: Optional[str] = Form(None),
+    q: Optional[str] = Form(None),
+    notify: Optional[str] = Form(None),
+    db: AsyncDB = Depends(get_async_db),
+    _: str = Depends(require_admin),
+):
+    """
+    Move many orders to a new status with a single UPDATE.
+
+    scope=selected updates the checked orders, scope=filter updates every order
+    matching the order list filters (batch, status, dates and search). Customers with an email address get
+    a pickup notice queued when orders move to "ready for pickup".
+    """
+    conditions = []
+    if scope == "selected":
+        if not order_ids:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Geen bestellingen geselecteerd",
+            )
+        conditions.append(Order.id.in_(_parse_order_ids(order_ids)))
+    else:
+        # The same filters as the order list, so exactly the listed orders change
+        conditions, status_filter_value, *_ = _order_filters(
+            status_filter, batch_id, date_from, date_to, q
+        )
+        if status_filter and status_filter_value is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Ongeldige status",
+            )
+        if not conditions:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Kies een filter om alle bestellingen bij te werken",
+            )
+
+    # Skip orders that already have the target status
+    conditions.append(Order.status != new_status)
+
+    def apply(db: Session) -> Tuple[int, int]:
+        updated = db.execute(
+            update(Order)
+            .where(*conditions)
+            .values(status=new_status, updated_at=func.now())
+            .returning(
+                Order.id, Order.customer_name, Order.customer_email, Order.batch_id
+            ),
+            execution_options={"synchronize_session": False},
+        ).all()
+
+        notified = 0
+        if notify and new_status == OrderStatus.READY_FOR_PICKUP:
+            recipients = [row for row in updated if row.customer_email]
+            batches = {
+                batch.slug: batch
+                for batch in db.query(Batch)
+                .options(selectinload(Batch.pickup_slots))
+                .filter(Batch.slug.in_({row.batch_id for row in recipients}))
+                .all()
+            }
+            emails = []
+            for row in recipients:
+                batch = batches.get(row.batch_id)
+                emails.append(
+                    (
+                        row.customer_email,
+                        *email_service.render_order_ready_to_customer(
+                            customer_name=row.customer_name,
+                            order_id=row.id,
+                            batch_name=batch.name if batch else row.batch_id,
+                            pickup_info=(
+                                batch.pickup_info if batch else "Wordt later bevestigd"
+                            ),
+                        ),
+                    )
+                )
+            notified = queue_emails(db, emails)
+
+        db.commit()
+        return len(updated), notified
+
+    updated, notified = await db.run(apply)
+    if notified:
+        outbox_dispatcher.wake()
+
+    return RedirectResponse(
+        url=f"/admin/orders?bulk_updated={updated}&bulk_notified={notified}",
+        status_code=status.HTTP_303_SEE_OTHER,
+    )
+
+
 @router.post("/orders/{order_id}/status")
 def update_order_status(
     order_id: int,
@@ -229,6 +473,7 @@ def create_product(
 
     db.add(product)
     db.commit()
+    catalog_cache.invalidate()
 
     return RedirectResponse(
         url="/admin/products?created=1", status_code=status.HTTP_303_SEE_OTHER
@@ -275,8 +520,10 @@ def update_product(
     product.unit_grams = _parse_optional_int(unit_grams)
     product.image = (image or "").strip() or None
 
+    affected_batches = [batch.slug for batch in product.batches]
     db.add(product)
     db.commit()
+    invalidate_product_documents(affected_batches)
 
     return RedirectResponse(
         url="/admin/products?saved=1", status_code=status.HTTP_303_SEE_OTHER
@@ -296,8 +543,10 @@ def delete_product(
             status_code=status.HTTP_404_NOT_FOUND, detail="Product niet gevonden"
         )
 
+    affected_batches = [batch.slug for batch in product.batches]
     db.delete(product)
     db.commit()
+    invalidate_product_documents(affected_batches)
 
     return RedirectResponse(
         url="/admin/products?deleted=1", status_code=status.HTTP_303_SEE_OTHER
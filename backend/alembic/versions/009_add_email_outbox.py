@@ -0,0 +1,57 @@
+"""Add email outbox table for background email delivery
+
+Revision ID: 009
+Revises: 008
+Create Date: 2025-11-24
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "009"
+down_revision = "008"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "email_outbox",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("to_email", sa.String(length=255), nullable=False),
+        sa.Column("subject", sa.String(length=255), nullable=False),
+        sa.Column("html_body", sa.Text(), nullable=False),
+        sa.Column("text_body", sa.Text(), nullable=True),
+        sa.Column(
+            "status", sa.String(length=20), nullable=False, server_default="pending"
+        ),
+        sa.Column("attempts", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column(
+            "next_attempt_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.Column("last_error", sa.Text(), nullable=True),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.Column("sent_at", sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_email_outbox_id", "email_outbox", ["id"])
+    op.create_index("ix_email_outbox_status", "email_outbox", ["status"])
+    op.create_index(
+        "ix_email_outbox_next_attempt_at", "email_outbox", ["next_attempt_at"]
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_email_outbox_next_attempt_at", table_name="email_outbox")
+    op.drop_index("ix_email_outbox_status", table_name="email_outbox")
+    op.drop_index("ix_email_outbox_id", table_name="email_outbox")
+    op.drop_table("email_outbox")
@@ -0,0 +1,22 @@
+"""Add composite (created_at, id) index for keyset pagination of orders
+
+Revision ID: 010
+Revises: 009
+Create Date: 2025-11-24
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "010"
+down_revision = "009"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_orders_created_at_id", "orders", ["created_at", "id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_orders_created_at_id", table_name="orders")
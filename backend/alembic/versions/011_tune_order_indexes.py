@@ -0,0 +1,57 @@
+"""Replace single-column order indexes with composite/partial indexes
+
+The order listings filter by batch and/or status and sort by created_at desc
+(with id as tie-breaker), so composite indexes let PostgreSQL read rows in
+order instead of scanning and sorting. The single-column indexes are prefixes
+of the new ones and only add write overhead.
+
+Revision ID: 011
+Revises: 010
+Create Date: 2025-11-24
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "011"
+down_revision = "010"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_orders_batch_id_created_at_id", "orders", ["batch_id", "created_at", "id"]
+    )
+    op.create_index(
+        "ix_orders_status_created_at_id", "orders", ["status", "created_at", "id"]
+    )
+    op.create_index(
+        "ix_orders_batch_id_status_created_at_id",
+        "orders",
+        ["batch_id", "status", "created_at", "id"],
+    )
+    op.create_index(
+        "ix_orders_active_batch_id_created_at",
+        "orders",
+        ["batch_id", "created_at"],
+        postgresql_where=sa.text(
+            "status IN ('pending', 'confirmed', 'ready for pickup')"
+        ),
+    )
+
+    op.drop_index("ix_orders_batch_id", table_name="orders")
+    op.drop_index("ix_orders_status", table_name="orders")
+    op.drop_index("ix_orders_created_at", table_name="orders")
+
+
+def downgrade() -> None:
+    op.create_index("ix_orders_created_at", "orders", ["created_at"])
+    op.create_index("ix_orders_status", "orders", ["status"])
+    op.create_index("ix_orders_batch_id", "orders", ["batch_id"])
+
+    op.drop_index("ix_orders_active_batch_id_created_at", table_name="orders")
+    op.drop_index("ix_orders_batch_id_status_created_at_id", table_name="orders")
+    op.drop_index("ix_orders_status_created_at_id", table_name="orders")
+    op.drop_index("ix_orders_batch_id_created_at_id", table_name="orders")
@@ -0,0 +1,33 @@
+"""Add per-batch product capacities for stock reservations
+
+Revision ID: 012
+Revises: 011
+Create Date: 2025-11-25
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "012"
+down_revision = "011"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "batch_capacities",
+        sa.Column("batch_id", sa.Integer(), nullable=False),
+        sa.Column("product_id", sa.Integer(), nullable=False),
+        sa.Column("capacity", sa.Integer(), nullable=False),
+        sa.Column("reserved", sa.Integer(), nullable=False, server_default="0"),
+        sa.CheckConstraint("reserved >= 0", name="ck_batch_capacities_reserved"),
+        sa.ForeignKeyConstraint(["batch_id"], ["batches.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["product_id"], ["products.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("batch_id", "product_id"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("batch_capacities")
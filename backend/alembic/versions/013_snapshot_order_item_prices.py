@@ -0,0 +1,41 @@
+"""Snapshot unit price and subtotal on order items
+
+Revision ID: 013
+Revises: 012
+Create Date: 2025-11-26
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "013"
+down_revision = "012"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("order_items", sa.Column("unit_price", sa.Float(), nullable=True))
+    op.add_column("order_items", sa.Column("subtotal", sa.Float(), nullable=True))
+
+    # Backfill with the current product prices; the price at order time of
+    # existing orders is not recorded anywhere
+    op.execute(
+        """
+        UPDATE order_items oi
+        SET unit_price = p.price,
+            subtotal = p.price * oi.quantity
+        FROM products p
+        WHERE oi.product_id = p.id
+        """
+    )
+
+    # Set not null after backfill
+    op.alter_column("order_items", "unit_price", nullable=False)
+    op.alter_column("order_items", "subtotal", nullable=False)
+
+
+def downgrade() -> None:
+    op.drop_column("order_items", "subtotal")
+    op.drop_column("order_items", "unit_price")
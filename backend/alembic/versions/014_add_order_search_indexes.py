@@ -0,0 +1,56 @@
+"""Add trigram indexes for searching orders by customer details
+
+pg_trgm GIN indexes serve ILIKE '%term%' lookups on the customer name, email
+and phone number (without separators) used by the admin order search.
+
+Revision ID: 014
+Revises: 013
+Create Date: 2025-11-27
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "014"
+down_revision = "013"
+branch_labels = None
+depends_on = None
+
+# Must match ORDER_PHONE_DIGITS in models.py, or the index is not used
+PHONE_DIGITS = (
+    "replace(replace(replace(replace(replace("
+    "customer_phone, ' ', ''), '.', ''), '/', ''), '-', ''), '+', '')"
+)
+
+
+def upgrade() -> None:
+    # Trusted extension: the database owner may create it (PostgreSQL 13+)
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    op.create_index(
+        "ix_orders_customer_name_trgm",
+        "orders",
+        ["customer_name"],
+        postgresql_using="gin",
+        postgresql_ops={"customer_name": "gin_trgm_ops"},
+    )
+    op.create_index(
+        "ix_orders_customer_email_trgm",
+        "orders",
+        ["customer_email"],
+        postgresql_using="gin",
+        postgresql_ops={"customer_email": "gin_trgm_ops"},
+    )
+    op.create_index(
+        "ix_orders_customer_phone_digits_trgm",
+        "orders",
+        [sa.text(f"{PHONE_DIGITS} gin_trgm_ops")],
+        postgresql_using="gin",
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_orders_customer_phone_digits_trgm", table_name="orders")
+    op.drop_index("ix_orders_customer_email_trgm", table_name="orders")
+    op.drop_index("ix_orders_customer_name_trgm", table_name="orders")
@@ -0,0 +1,32 @@
+"""Allow batch capacity rows without a limit
+
+Clearing a product's stock in the admin used to delete its capacity row and
+with it the count of reserved units. The row now stays with a NULL capacity
+(unlimited), so a limit set again later still accounts for what was sold.
+
+Revision ID: 015
+Revises: 014
+Create Date: 2025-12-02
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "015"
+down_revision = "014"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.alter_column(
+        "batch_capacities", "capacity", existing_type=sa.Integer(), nullable=True
+    )
+
+
+def downgrade() -> None:
+    op.execute("DELETE FROM batch_capacities WHERE capacity IS NULL")
+    op.alter_column(
+        "batch_capacities", "capacity", existing_type=sa.Integer(), nullable=False
+    )
@@ -0,0 +1,226 @@
+"""Push remaining batch stock to open webshop pages.
+
+Browsers subscribe to a batch with server-sent events. Every change to the
+batch's stock drops its document from ``availability_cache`` (locally, or via
+the cache invalidation channel when it happened in another worker). The drop is
+coalesced per batch: after a short delay one query rebuilds the document and
+the result is written to every open stream, so the cost of a change does not
+grow with the number of open tabs.
+"""
+
+import asyncio
+import contextvars
+import logging
+import os
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Dict, Hashable, Optional
+
+from sqlalchemy import and_, select
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from cache import CachedDocument, availability_cache
+from database import SessionLocal
+from metrics import AVAILABILITY_SUBSCRIBERS
+from models import Batch, BatchCapacity, Product, batch_products
+from schemas import BatchAvailabilityResponse, ProductAvailability
+
+logger = logging.getLogger(__name__)
+
+# Changes arriving within this window are sent as one update
+COALESCE_DELAY = float(os.getenv("AVAILABILITY_COALESCE_MS", "500")) / 1000
+# Comment lines keep idle streams open through proxies
+KEEPALIVE_INTERVAL = float(os.getenv("AVAILABILITY_KEEPALIVE_SECONDS", "15"))
+# Streams are closed after this long and the browser reconnects, so a deploy
+# never waits on open streams and connections spread over new workers
+STREAM_LIFETIME = float(os.getenv("AVAILABILITY_STREAM_SECONDS", "300"))
+# Reconnect delay sent to EventSource clients
+RETRY_MS = 3000
+
+
+def build_availability(db: Session, batch_slug: str) -> Optional[bytes]:
+    """Serialize the remaining stock per product of a batch, in one query."""
+    rows = db.execute(
+        select(Batch.id, Product.slug, BatchCapacity.capacity, BatchCapacity.reserved)
+        .select_from(Batch)
+        .outerjoin(batch_products, batch_products.c.batch_id == Batch.id)
+        .outerjoin(Product, Product.id == batch_products.c.product_id)
+        .outerjoin(
+            BatchCapacity,
+            and_(
+                BatchCapacity.batch_id == Batch.id,
+                BatchCapacity.product_id == Product.id,
+            ),
+        )
+        .where(Batch.slug == batch_slug)
+        .order_by(Product.slug)
+    ).all()
+    if not rows:
+        return None
+
+    products = []
+    for _, slug, capacity, reserved in rows:
+        if slug is None:
+            continue
+        remaining = None if capacity is None else max(capacity - reserved, 0)
+        products.append(
+            ProductAvailability(slug=slug, remaining=remaining, sold_out=remaining == 0)
+        )
+    response = BatchAvailabilityResponse(batch=batch_slug, products=products)
+    return response.model_dump_json().encode()
+
+
+def load_availability(db: Session, batch_slug: str) -> Optional[CachedDocument]:
+    """Cached availability document of a batch, or None if it does not exist."""
+    return availability_cache.get(batch_slug, lambda: build_availability(db, batch_slug))
+
+
+def _load(batch_slug: str) -> Optional[CachedDocument]:
+    db = SessionLocal()
+    try:
+        return load_availability(db, batch_slug)
+    finally:
+        db.close()
+
+
+def format_event(document: Optional[CachedDocument]) -> bytes:
+    """Encode a document as a server-sent event, or None as a keepalive."""
+    if document is None:
+        return b": keepalive\n\n"
+    return b"event: availability\ndata: " + document.body + b"\n\n"
+
+
+@dataclass
+class _Topic:
+    """Open streams of one batch and the document they were last sent"""
+
+    document: Optional[CachedDocument] = None
+    subscribers: int = 0
+    # Replaced on every publish; setting the old one wakes all streams
+    changed: asyncio.Event = field(default_factory=asyncio.Event)
+    refresh: Optional[asyncio.Task] = None
+
+
+class AvailabilityBroadcaster:
+    """Fans out availability changes to the streams of this worker"""
+
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._topics: Dict[str, _Topic] = {}
+        self._closed = False
+
+    def start(self) -> None:
+        if self._loop is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._closed = False
+        availability_cache.drop_listeners.append(self.changed)
+
+    async def stop(self) -> None:
+        """End all open streams."""
+        if self._loop is None:
+            return
+        availability_cache.drop_listeners.remove(self.changed)
+        self._closed = True
+        self._loop = None
+        for topic in self._topics.values():
+            if topic.refresh is not None:
+                topic.refresh.cancel()
+            topic.changed.set()
+
+    async def load(self, batch_slug: str) -> Optional[CachedDocument]:
+        """Cached availability document, built without a request session."""
+        document = availability_cache.peek(batch_slug)
+        if document is None and SessionLocal is not None:
+            document = await run_in_threadpool(_load, batch_slug)
+        return document
+
+    def changed(self, batch_slug: Optional[Hashable]) -> None:
+        """Schedule a refresh of a batch (or all when None); any thread."""
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        # Run outside the caller's context, so the refresh query is not
+        # counted against the request that triggered it
+        loop.call_soon_threadsafe(
+            self._schedule, batch_slug, context=contextvars.Context()
+        )
+
+    def _schedule(self, batch_slug: Optional[Hashable]) -> None:
+        if self._closed:
+            return
+        slugs = list(self._topics) if batch_slug is None else [batch_slug]
+        for slug in slugs:
+            topic = self._topics.get(slug)
+            # Already scheduled changes pick this one up as well
+            if topic is not None and topic.refresh is None:
+                topic.refresh = asyncio.create_task(self._refresh(slug, topic))
+
+    async def _refresh(self, batch_slug: str, topic: _Topic) -> None:
+        await asyncio.sleep(COALESCE_DELAY)
+        # Changes from here on schedule a new refresh
+        topic.refresh = None
+        try:
+            document = await self.load(batch_slug)
+        except Exception:
+            logger.exception(f"Failed to refresh availability of batch {batch_slug}")
+            return
+        if document is not None:
+            self._publish(topic, document)
+
+    def _publish(self, topic: _Topic, document: CachedDocument) -> None:
+        if topic.document is not None and topic.document.etag == document.etag:
+            return
+        topic.document = document
+        changed, topic.changed = topic.changed, asyncio.Event()
+        changed.set()
+
+    async def subscribe(self, batch_slug: str) -> AsyncIterator[Optional[CachedDocument]]:
+        """Yield the current document, then every change, with None as keepalive.
+
+        Ends after STREAM_LIFETIME, on shutdown or when the batch is gone.
+        """
+        topic = self._topics.setdefault(batch_slug, _Topic())
+        topic.subscribers += 1
+        AVAILABILITY_SUBSCRIBERS.inc()
+        try:
+            # Registered first, so a change during the initial load is not missed
+            if topic.document is None:
+                document = await self.load(batch_slug)
+                if document is None:
+                    return
+                if topic.document is None:
+                    topic.document = document
+
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + STREAM_LIFETIME
+            sent = None
+            while not self._closed:
+                if topic.document is not sent:
+                    sent = topic.document
+                    yield sent
+                    continue
+
+                timeout = min(KEEPALIVE_INTERVAL, deadline - loop.time())
+                if timeout <= 0:
+                    return
+                try:
+                    await asyncio.wait_for(topic.changed.wait(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    yield None
+        finally:
+            AVAILABILITY_SUBSCRIBERS.dec()
+            topic.subscribers -= 1
+            if topic.subscribers == 0 and self._topics.get(batch_slug) is topic:
+                del self._topics[batch_slug]
+                if topic.refresh is not None:
+                    topic.refresh.cancel()
+
+    async def stream(self, batch_slug: str) -> AsyncIterator[bytes]:
+        """Server-sent event stream of a batch's availability."""
+        yield f"retry: {RETRY_MS}\n\n".encode()
+        async for document in self.subscribe(batch_slug):
+            yield format_event(document)
+
+
+broadcaster = AvailabilityBroadcaster()
@@ -1,17 +1,18 @@
 """Batch management routes - both API and admin panel."""
 
-from typing import List, Optional
-from fastapi import APIRouter, Depends, Form, HTTPException, Request, status
-from fastapi.responses import HTMLResponse, RedirectResponse
-from fastapi.templating import Jinja2Templates
-from sqlalchemy.orm import Session
-
-from database import get_db
-from models import Batch, PickupSlot, Product
-from schemas import BatchResponse, BatchListResponse
+from typing import Dict, List, Literal, Optional
+from fastapi import APIRouter, Depends, Form, HTTPException, Query, Request, status
+from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse, StreamingResponse
+from sqlalchemy.orm import Session, selectinload
+
+from availability import broadcaster as availability_broadcaster, load_availability
+from cache import availability_cache, batch_cache, cached_json_response
+from database import AsyncDB, get_async_db, get_db
+from models import Batch, BatchCapacity, PickupSlot, Product
+from schemas import BatchAvailabilityResponse, BatchResponse, BatchListResponse
 from admin import require_admin
-
-templates = Jinja2Templates(directory="templates")
+from reports import PICK_LIST_CSV_HEADER, batch_pick_list, pick_list_csv_rows, stream_csv
+from templating import templates
 
 # Create two routers - one for API, one for admin UI
 api_router = APIRouter(prefix="/api/batches", tags=["batches"])
@@ -23,9 +24,9 @@ admin_router = APIRouter(prefix="/admin/batches", tags=["admin", "batches"])
 # ============================================================================
 
 @api_router.get("", response_model=List[BatchListResponse])
-def list_batches_api(
+async def list_batches_api(
     include_inactive: bool = False,
-    db: Session = Depends(get_db),
+    db: AsyncDB = Depends(get_async_db),
 ):
     """
     List all batches (public API).
@@ -33,32 +34,103 @@ def list_batches_api(
     By default, only returns active batches.
     Set include_inactive=true to include inactive batches.
     """
-    query = db.query(Batch)
 
-    if not include_inactive:
-        query = query.filter(Batch.is_active == True)
+    def load(db: Session) -> List[BatchListResponse]:
+        query = db.query(Batch)
+
+        if not include_inactive:
+            query = query.filter(Batch.is_active == True)
 
-    batches = query.order_by(Batch.is_freezer.asc(), Batch.created_at.desc()).all()
-    return batches
+        batches = query.order_by(Batch.is_freezer.asc(), Batch.created_at.desc()).all()
+        return [BatchListResponse.model_validate(batch) for batch in batches]
+
+    return await db.run(load)
 
 
 @api_router.get("/{batch_slug}", response_model=BatchResponse)
-def get_batch_api(
+async def get_batch_api(
     batch_slug: str,
-    db: Session = Depends(get_db),
+    request: Request,
+    db: AsyncDB = Depends(get_async_db),
 ):
     """
     Get a specific batch by slug, including its pickup slots and products (public API).
+
+    The serialized document is kept in memory until the batch or one of its
+    products is edited, so repeated requests are a plain lookup.
     """
-    batch = db.query(Batch).filter(Batch.slug == batch_slug).first()
 
-    if not batch:
+    def build(db: Session) -> Optional[bytes]:
+        batch = (
+            db.query(Batch)
+            .options(selectinload(Batch.pickup_slots), selectinload(Batch.products))
+            .filter(Batch.slug == batch_slug)
+            .first()
+        )
+        if not batch:
+            return None
+        return BatchResponse.model_validate(batch).model_dump_json().encode()
+
+    document = batch_cache.peek(batch_slug)
+    if document is None:
+        document = await db.run(
+            lambda session: batch_cache.get(batch_slug, lambda: build(session))
+        )
+    if document is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Batch '{batch_slug}' niet gevonden",
+        )
+
+    return cached_json_response(request, document)
+
+
+@api_router.get("/{batch_slug}/availability", response_model=BatchAvailabilityResponse)
+async def get_batch_availability_api(
+    batch_slug: str,
+    request: Request,
+    db: AsyncDB = Depends(get_async_db),
+):
+    """
+    Remaining stock per product of a batch (public API).
+
+    `remaining` is null for products without a limit. Served from memory until
+    an order or an admin edit changes the stock.
+    """
+    document = availability_cache.peek(batch_slug)
+    if document is None:
+        document = await db.run(load_availability, batch_slug)
+    if document is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Batch '{batch_slug}' niet gevonden",
         )
 
-    return batch
+    return cached_json_response(request, document)
+
+
+@api_router.get("/{batch_slug}/availability/stream")
+async def stream_batch_availability_api(batch_slug: str):
+    """
+    Server-sent events with the remaining stock of a batch (public API).
+
+    Sends the current availability, then a new `availability` event whenever
+    it changes. Changes are batched and shared by all open streams, so a
+    stream costs no database work of its own. Streams close after a few
+    minutes; EventSource reconnects automatically.
+    """
+    # No request session here: it would be held for the life of the stream
+    if await availability_broadcaster.load(batch_slug) is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Batch '{batch_slug}' niet gevonden",
+        )
+
+    return StreamingResponse(
+        availability_broadcaster.stream(batch_slug),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 # ============================================================================
@@ -66,6 +138,40 @@ def get_batch_api(
 # ============================================================================
 
 
+def _parse_capacities(form_data, product_ids: List[str]) -> Dict[int, Optional[int]]:
+    """Read the optional capacity field of every selected product."""
+    capacities = {}
+    for product_id in product_ids:
+        value = (form_data.get(f"capacity_{product_id}") or "").strip()
+        if not value:
+            capacities[int(product_id)] = None
+            continue
+        if not value.isdigit():
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Voorraad moet een positief geheel getal zijn",
+            )
+        capacities[int(product_id)] = int(value)
+    return capacities
+
+
+def _set_capacities(batch: Batch, capacities: Dict[int, Optional[int]]) -> None:
+    """Create or update capacity rows; reservations are kept.
+
+    A cleared field or unchecked product only drops the limit, so the units
+    already reserved still count when a limit is set again.
+    """
+    existing = {capacity.product_id: capacity for capacity in batch.capacities}
+    for product_id, limit in capacities.items():
+        if product_id in existing:
+            existing[product_id].capacity = limit
+        elif limit is not None:
+            batch.capacities.append(BatchCapacity(product_id=product_id, capacity=limit))
+    for product_id, capacity in existing.items():
+        if product_id not in capacities:
+            capacity.capacity = None
+
+
 @admin_router.get("", response_class=HTMLResponse)
 def list_batches_admin(
     request: Request,
@@ -96,7 +202,13 @@ def new_batch_form(
     products = db.query(Product).order_by(Product.name).all()
     return templates.TemplateResponse(
         "admin/batch_form.html",
-        {"request": request, "mode": "new", "batch": None, "products": products},
+        {
+            "request": request,
+            "mode": "new",
+            "batch": None,
+            "products": products,
+            "capacities": {},
+        },
     )
 
 
@@ -109,7 +221,7 @@ async def create_batch(
     pickup_text: Optional[str] = Form(None),
     is_freezer: Optional[str] = Form(None),
     is_active: Optional[str] = Form(None),
-    db: Session = Depends(get_db),
+    db: AsyncDB = Depends(get_async_db),
     _: str = Depends(require_admin),
 ):
     """Create a new batch."""
@@ -118,34 +230,41 @@ async def create_batch(
     product_ids = form_data.getlist("product_ids")
     slot_dates = form_data.getlist("slot_dates")
     slot_times = form_data.getlist("slot_times")
-
-    # Create batch
-    batch = Batch(
-        slug=slug.strip(),
-        name=name.strip(),
-        pickup_location=pickup_location.strip(),
-        pickup_text=pickup_text.strip() if pickup_text else None,
-        is_freezer=(is_freezer == "true"),
-        is_active=(is_active == "true"),
-    )
-    db.add(batch)
-    db.flush()  # Get batch.id
-
-    # Add products
-    if product_ids:
-        product_id_ints = [int(pid) for pid in product_ids]
-        products = db.query(Product).filter(Product.id.in_(product_id_ints)).all()
-        batch.products = products
-
-    # Add pickup slots
-    for i, (date, time) in enumerate(zip(slot_dates, slot_times)):
-        if date and time:  # Only add if both date and time are provided
-            slot = PickupSlot(
-                batch_id=batch.id, date=date, time=time, sort_order=i
-            )
-            db.add(slot)
-
-    db.commit()
+    capacities = _parse_capacities(form_data, product_ids)
+
+    def create(db: Session) -> None:
+        # Create batch
+        batch = Batch(
+            slug=slug.strip(),
+            name=name.strip(),
+            pickup_location=pickup_location.strip(),
+            pickup_text=pickup_text.strip() if pickup_text else None,
+            is_freezer=(is_freezer == "true"),
+            is_active=(is_active == "true"),
+        )
+        db.add(batch)
+        db.flush()  # Get batch.id
+
+        # Add products
+        if product_ids:
+            product_id_ints = [int(pid) for pid in product_ids]
+            products = db.query(Product).filter(Product.id.in_(product_id_ints)).all()
+            batch.products = products
+        _set_capacities(batch, capacities)
+
+        # Add pickup slots
+        for i, (date, time) in enumerate(zip(slot_dates, slot_times)):
+            if date and time:  # Only add if both date and time are provided
+                slot = PickupSlot(
+                    batch_id=batch.id, date=date, time=time, sort_order=i
+                )
+                db.add(slot)
+
+        db.commit()
+
+    await db.run(create)
+    batch_cache.invalidate(slug.strip())
+    availability_cache.invalidate(slug.strip())
     return RedirectResponse(
         url="/admin/batches?created=1", status_code=status.HTTP_303_SEE_OTHER
     )
@@ -173,10 +292,44 @@ def edit_batch_form(
             "mode": "edit",
             "batch": batch,
             "products": products,
+            "capacities": {c.product_id: c for c in batch.capacities},
         },
     )
 
 
+@admin_router.get("/{batch_id}/pick-list")
+def batch_pick_list_admin(
+    batch_id: int,
+    request: Request,
+    output: Literal["html", "json", "csv"] = Query("html", alias="format"),
+    db: Session = Depends(get_db),
+    _: str = Depends(require_admin),
+):
+    """Pick list for pickup day: units per product and status (HTML, JSON or CSV)."""
+    batch = db.query(Batch).filter(Batch.id == batch_id).first()
+    if not batch:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Batch niet gevonden"
+        )
+
+    report = batch_pick_list(db, batch)
+
+    if output == "json":
+        return JSONResponse(report.model_dump())
+    if output == "csv":
+        return StreamingResponse(
+            stream_csv(PICK_LIST_CSV_HEADER, pick_list_csv_rows(report)),
+            media_type="text/csv",
+            headers={
+                "Content-Disposition": f'attachment; filename="paklijst-{batch.slug}.csv"'
+            },
+        )
+    return templates.TemplateResponse(
+        "admin/pick_list.html",
+        {"request": request, "batch": batch, "report": report},
+    )
+
+
 @admin_router.post("/{batch_id}/update", response_class=RedirectResponse)
 async def update_batch(
     batch_id: int,
@@ -187,70 +340,89 @@ async def update_batch(
     pickup_text: Optional[str] = Form(None),
     is_freezer: Optional[str] = Form(None),
     is_active: Optional[str] = Form(None),
-    db: Session = Depends(get_db),
+    db: AsyncDB = Depends(get_async_db),
     _: str = Depends(require_admin),
 ):
     """Update an existing batch."""
-    batch = db.query(Batch).filter(Batch.id == batch_id).first()
-    if not batch:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="Batch niet gevonden"
-        )
-
     # Get form data manually for lists
     form_data = await request.form()
     product_ids = form_data.getlist("product_ids")
     slot_dates = form_data.getlist("slot_dates")
     slot_times = form_data.getlist("slot_times")
+    capacities = _parse_capacities(form_data, product_ids)
 
-    # Update batch fields
-    batch.slug = slug.strip()
-    batch.name = name.strip()
-    batch.pickup_location = pickup_location.strip()
-    batch.pickup_text = pickup_text.strip() if pickup_text else None
-    batch.is_freezer = (is_freezer == "true")
-    batch.is_active = (is_active == "true")
-
-    # Update products
-    if product_ids:
-        product_id_ints = [int(pid) for pid in product_ids]
-        products = db.query(Product).filter(Product.id.in_(product_id_ints)).all()
-        batch.products = products
-    else:
-        batch.products = []
-
-    # Delete existing pickup slots and recreate
-    db.query(PickupSlot).filter(PickupSlot.batch_id == batch_id).delete()
-
-    # Add new pickup slots
-    for i, (date, time) in enumerate(zip(slot_dates, slot_times)):
-        if date and time:
-            slot = PickupSlot(
-                batch_id=batch.id, date=date, time=time, sort_order=i
+    def update(db: Session) -> str:
+        batch = db.query(Batch).filter(Batch.id == batch_id).first()
+        if not batch:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Batch niet gevonden"
             )
-            db.add(slot)
 
-    db.commit()
+        previous_slug = batch.slug
+
+        # Update batch fields
+        batch.slug = slug.strip()
+        batch.name = name.strip()
+        batch.pickup_location = pickup_location.strip()
+        batch.pickup_text = pickup_text.strip() if pickup_text else None
+        batch.is_freezer = (is_freezer == "true")
+        batch.is_active = (is_active == "true")
+
+        # Update products
+        if product_ids:
+            product_id_ints = [int(pid) for pid in product_ids]
+            products = db.query(Product).filter(Product.id.in_(product_id_ints)).all()
+            batch.products = products
+        else:
+            batch.products = []
+        _set_capacities(batch, capacities)
+
+        # Delete existing pickup slots and recreate
+        db.query(PickupSlot).filter(PickupSlot.batch_id == batch_id).delete()
+
+        # Add new pickup slots
+        for i, (date, time) in enumerate(zip(slot_dates, slot_times)):
+            if date and time:
+                slot = PickupSlot(
+                    batch_id=batch.id, date=date, time=time, sort_order=i
+                )
+                db.add(slot)
+
+        db.commit()
+        return previous_slug
+
+    previous_slug = await db.run(update)
+    for changed_slug in {previous_slug, slug.strip()}:
+        batch_cache.invalidate(changed_slug)
+        availability_cache.invalidate(changed_slug)
     return RedirectResponse(
         url="/admin/batches?saved=1", status_code=status.HTTP_303_SEE_OTHER
     )
 
 
 @admin_router.post("/{batch_id}/delete", response_class=RedirectResponse)
-def delete_batch(
+async def delete_batch(
     batch_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncDB = Depends(get_async_db),
     _: str = Depends(require_admin),
 ):
     """Delete a batch."""
-    batch = db.query(Batch).filter(Batch.id == batch_id).first()
-    if not batch:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="Batch niet gevonden"
-        )
 
-    db.delete(batch)
-    db.commit()
+    def delete(db: Session) -> str:
+        batch = db.query(Batch).filter(Batch.id == batch_id).first()
+        if not batch:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Batch niet gevonden"
+            )
+
+        batch_slug = batch.slug
+        db.delete(batch)
+        db.commit()
+        return batch_slug
+
+    batch_slug = await db.run(delete)
+    batch_cache.invalidate(batch_slug)
+    availability_cache.invalidate(batch_slug)
     return RedirectResponse(
         url="/admin/batches?deleted=1", status_code=status.HTTP_303_SEE_OTHER
     )
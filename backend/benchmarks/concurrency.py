@@ -0,0 +1,64 @@
+"""Measure throughput and latency of the public API under concurrent load.
+
+Fires concurrent GET requests at a running server and reports requests per
+second with p50/p99 latency per endpoint. Compare a server started with
+DATABASE_ASYNC=false (threadpool) against DATABASE_ASYNC=true (async driver).
+
+Usage (from the backend directory, with the server running):
+    python -m benchmarks.concurrency [base_url] [batch_slug]
+"""
+
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+import httpx
+
+REQUESTS = int(os.getenv("BENCH_REQUESTS", "500"))
+CONCURRENCY = int(os.getenv("BENCH_CONCURRENCY", "50"))
+
+
+async def _measure(client: httpx.AsyncClient, path: str, **kwargs) -> None:
+    latencies: list[float] = []
+    failures = 0
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+
+    async def one() -> None:
+        nonlocal failures
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.get(path, **kwargs)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code != 200:
+                failures += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(REQUESTS)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    p50 = statistics.median(latencies) * 1000
+    p99 = latencies[int(len(latencies) * 0.99) - 1] * 1000
+    print(
+        f"{path:32} {REQUESTS / elapsed:8.1f} req/s"
+        f"  p50 {p50:7.1f} ms  p99 {p99:7.1f} ms"
+        + (f"  ({failures} failed)" if failures else "")
+    )
+
+
+async def main(base_url: str, batch_slug: str) -> None:
+    limits = httpx.Limits(max_connections=CONCURRENCY)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits) as client:
+        print(f"{REQUESTS} requests per endpoint, {CONCURRENCY} concurrent")
+        await _measure(client, "/api/products/")
+        await _measure(client, f"/api/batches/{batch_slug}")
+        await _measure(client, "/api/batches")
+        await _measure(client, "/api/orders/", params={"limit": 50})
+
+
+if __name__ == "__main__":
+    url = sys.argv[1] if len(sys.argv) > 1 else "http://localhost:8000"
+    slug = sys.argv[2] if len(sys.argv) > 2 else "test"
+    asyncio.run(main(url, slug))
@@ -0,0 +1,50 @@
+"""Benchmark order email rendering.
+
+Reports the CPU cost of rendering one order email (HTML + text) so template
+changes can be checked against high mailing volumes.
+
+Usage (from the backend directory):
+    python -m benchmarks.email_render [number_of_emails]
+"""
+
+import sys
+import time
+
+from email_service import email_service
+
+ITEMS = [
+    {"name": f"Product {i}", "quantity": i % 3 + 1, "subtotal": 8.5 * (i % 3 + 1)}
+    for i in range(10)
+]
+TOTAL = sum(item["subtotal"] for item in ITEMS)
+
+
+def main(count: int = 5000) -> None:
+    start_wall = time.perf_counter()
+    start_cpu = time.process_time()
+
+    for order_id in range(count):
+        email_service.render_order_confirmation_to_customer(
+            "Jan Janssens", order_id, "15 december 2024", "Op afspraak", ITEMS, TOTAL
+        )
+        email_service.render_order_notification_to_admin(
+            order_id,
+            "Jan Janssens",
+            "+32494123456",
+            "jan@example.com",
+            "15 december 2024",
+            "Op afspraak",
+            ITEMS,
+            TOTAL,
+            "Graag via achteringang",
+        )
+
+    cpu = time.process_time() - start_cpu
+    wall = time.perf_counter() - start_wall
+    emails = count * 2
+    print(f"Rendered {emails} emails (HTML + text) in {wall:.2f}s wall, {cpu:.2f}s CPU")
+    print(f"Per email: {cpu / emails * 1e6:.0f} µs CPU, {emails / wall:.0f} emails/s")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
@@ -0,0 +1,49 @@
+"""Measure API cold start: import time and time until ready to serve.
+
+Uses the same measurements as tests/test_startup.py: importing `main` in a
+fresh interpreter, and spawning `uvicorn main:app` until /health answers.
+Prints the medians next to the budgets the test enforces.
+
+Usage (from the backend directory):
+    python -m benchmarks.startup [runs]
+
+Without DATABASE_URL a throwaway SQLite database is used.
+"""
+
+import os
+import statistics
+import sys
+import tempfile
+
+from tests.test_startup import (
+    IMPORT_BUDGET_MS,
+    READY_BUDGET_MS,
+    RUNS,
+    _import_main,
+    _ready_ms,
+)
+
+
+def main(runs: int = RUNS) -> None:
+    if "DATABASE_URL" not in os.environ:
+        path = os.path.join(tempfile.gettempdir(), "akkervarken-startup.sqlite")
+        os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+        # Migrations are PostgreSQL-only; the stand-in database has no schema
+        os.environ.setdefault("MIGRATE_ON_STARTUP", "false")
+
+    imports = [_import_main()["ms"] for _ in range(runs)]
+    ready = [_ready_ms() for _ in range(runs)]
+
+    print(f"Runs:            {runs}")
+    print(
+        f"import main:     median {statistics.median(imports):6.0f} ms"
+        f"  (max {max(imports):.0f}, budget {IMPORT_BUDGET_MS:.0f})"
+    )
+    print(
+        f"ready to serve:  median {statistics.median(ready):6.0f} ms"
+        f"  (max {max(ready):.0f}, budget {READY_BUDGET_MS:.0f})"
+    )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else RUNS)
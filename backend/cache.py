@@ -0,0 +1,166 @@
+"""In-process cache for serialized, read-mostly JSON documents.
+
+Public catalog and batch documents only change when an admin edits them, so
+they are serialized once and served from memory with strong ETag and
+Last-Modified validators until a write path invalidates them.
+"""
+
+import hashlib
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Callable, Dict, Hashable, Iterable, List, Optional
+
+from fastapi import Request, Response, status
+
+
+@dataclass(frozen=True)
+class CachedDocument:
+    """A serialized JSON body with its validators"""
+
+    body: bytes
+    etag: str
+    last_modified: datetime
+
+    @classmethod
+    def from_body(cls, body: bytes) -> "CachedDocument":
+        etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+        # HTTP dates have second precision
+        now = datetime.now(timezone.utc).replace(microsecond=0)
+        return cls(body=body, etag=etag, last_modified=now)
+
+
+# Every DocumentCache by name, so invalidations from other workers can be applied
+caches: Dict[str, "DocumentCache"] = {}
+
+# Called with (cache name, key) after every local invalidation, e.g. to
+# broadcast it to the other worker processes
+invalidation_listeners: List[Callable[[str, Optional[Hashable]], None]] = []
+
+
+class DocumentCache:
+    """Thread-safe cache of serialized documents, keyed by e.g. a slug"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._documents: Dict[Hashable, CachedDocument] = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+        # Called with the key (None for everything) after every drop, local or
+        # from another worker; may run on any thread
+        self.drop_listeners: List[Callable[[Optional[Hashable]], None]] = []
+        caches[name] = self
+
+    def peek(self, key: Hashable) -> Optional[CachedDocument]:
+        """Return the cached document, or None on a miss."""
+        return self._documents.get(key)
+
+    def get(
+        self, key: Hashable, build: Callable[[], Optional[bytes]]
+    ) -> Optional[CachedDocument]:
+        """Return the cached document, building it on a miss.
+
+        ``build`` returns the serialized body, or None when the document does
+        not exist (which is not cached). The lock is never held while building,
+        since ``build`` may run database I/O on the event loop; instead a build
+        that raced with an invalidation is served once but not stored.
+        """
+        document = self._documents.get(key)
+        if document is not None:
+            return document
+
+        generation = self._generation
+        body = build()
+        if body is None:
+            return None
+        document = CachedDocument.from_body(body)
+
+        with self._lock:
+            if self._generation == generation:
+                self._documents[key] = document
+        return document
+
+    def invalidate(self, key: Optional[Hashable] = None) -> None:
+        """Drop one document, or every document when no key is given.
+
+        Registered invalidation listeners are notified so other processes can
+        drop their copy too.
+        """
+        self.drop(key)
+        for listener in invalidation_listeners:
+            listener(self.name, key)
+
+    def drop(self, key: Optional[Hashable] = None) -> None:
+        """Like invalidate(), but only for this process."""
+        with self._lock:
+            self._generation += 1
+            if key is None:
+                self._documents.clear()
+            else:
+                self._documents.pop(key, None)
+        for listener in self.drop_listeners:
+            listener(key)
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    if header.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in header.split(",")]
+    # Weak comparison, as required for If-None-Match
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+def _not_modified_since(header: str, last_modified: datetime) -> bool:
+    try:
+        since = parsedate_to_datetime(header)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    return last_modified <= since
+
+
+def cached_json_response(request: Request, document: CachedDocument) -> Response:
+    """Serve a cached document, answering 304 to matching conditional requests."""
+    headers = {
+        "ETag": document.etag,
+        "Last-Modified": format_datetime(document.last_modified, usegmt=True),
+        # Let browsers keep a copy but revalidate it on every use
+        "Cache-Control": "no-cache",
+    }
+
+    if_none_match = request.headers.get("if-none-match")
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_none_match is not None:
+        not_modified = _etag_matches(if_none_match, document.etag)
+    elif if_modified_since is not None:
+        not_modified = _not_modified_since(if_modified_since, document.last_modified)
+    else:
+        not_modified = False
+
+    if not_modified:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    return Response(
+        content=document.body, media_type="application/json", headers=headers
+    )
+
+
+# Serialized public product catalog (GET /api/products/)
+catalog_cache = DocumentCache("catalog")
+
+# Serialized batch detail documents (GET /api/batches/{slug}), keyed by slug
+batch_cache = DocumentCache("batch")
+
+# Remaining stock per product of a batch (GET /api/batches/{slug}/availability),
+# keyed by slug; dropped whenever an order or admin edit changes it
+availability_cache = DocumentCache("availability")
+
+
+def invalidate_product_documents(batch_slugs: Iterable[str]) -> None:
+    """Drop the catalog and the batch documents of the batches that list a product."""
+    catalog_cache.invalidate()
+    for slug in batch_slugs:
+        batch_cache.invalidate(slug)
+        availability_cache.invalidate(slug)
@@ -0,0 +1,156 @@
+"""Keep the in-process document caches consistent across worker processes.
+
+Every DocumentCache invalidation is broadcast with PostgreSQL NOTIFY after the
+write has been committed. Each worker LISTENs on a dedicated connection and
+drops the same documents from its own caches. While the listener is
+(re)connecting notifications can be missed, so every (re)connect starts by
+clearing all caches.
+
+Without PostgreSQL (local SQLite development) there is only one process and
+nothing is started.
+"""
+
+import asyncio
+import json
+import logging
+import uuid
+from typing import Hashable, Optional, Set
+
+from sqlalchemy import text
+from starlette.concurrency import run_in_threadpool
+
+from cache import caches, invalidation_listeners
+from database import engine
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "cache_invalidation"
+RECONNECT_DELAY = 5.0
+# Ping the listening connection when idle, so a silently dropped connection
+# is noticed and re-established
+KEEPALIVE_INTERVAL = 60.0
+
+# Identifies this process, so it can skip its own notifications
+ORIGIN = uuid.uuid4().hex
+
+
+def _notify(payload: str) -> None:
+    with engine.begin() as conn:
+        conn.execute(
+            text("SELECT pg_notify(:channel, :payload)"),
+            {"channel": CHANNEL, "payload": payload},
+        )
+
+
+def _connect():
+    """Open a dedicated autocommit connection that LISTENs on the channel."""
+    proxy = engine.raw_connection()
+    # Take it out of the pool; it stays open for the life of the worker
+    proxy.detach()
+    conn = proxy.dbapi_connection
+    conn.autocommit = True
+    with conn.cursor() as cursor:
+        cursor.execute(f"LISTEN {CHANNEL}")
+    return conn
+
+
+def _ping(conn) -> None:
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT 1")
+
+
+def _apply(payload: str) -> None:
+    try:
+        message = json.loads(payload)
+    except ValueError:
+        logger.warning(f"Ignoring malformed cache invalidation: {payload!r}")
+        return
+    if message.get("origin") == ORIGIN:
+        return
+    cache = caches.get(message.get("cache"))
+    if cache is not None:
+        cache.drop(message.get("key"))
+
+
+class CacheInvalidationChannel:
+    """Broadcasts and applies cache invalidations between worker processes"""
+
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        self._pending: Set[asyncio.Task] = set()
+
+    def start(self) -> None:
+        """Start listening (no-op unless the database is PostgreSQL)."""
+        if engine is None or engine.dialect.name != "postgresql":
+            return
+        if self._task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        invalidation_listeners.append(self.publish)
+        self._task = asyncio.create_task(self._run())
+        logger.info("Cache invalidation listener started")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        invalidation_listeners.remove(self.publish)
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        if self._pending:
+            await asyncio.gather(*self._pending, return_exceptions=True)
+
+    def publish(self, cache_name: str, key: Optional[Hashable]) -> None:
+        """Broadcast an invalidation; safe to call from any thread."""
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        payload = json.dumps({"origin": ORIGIN, "cache": cache_name, "key": key})
+        loop.call_soon_threadsafe(self._send, payload)
+
+    def _send(self, payload: str) -> None:
+        task = asyncio.create_task(run_in_threadpool(_notify, payload))
+        self._pending.add(task)
+        task.add_done_callback(self._sent)
+
+    def _sent(self, task: asyncio.Task) -> None:
+        self._pending.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Failed to broadcast cache invalidation: {task.exception()}")
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self._listen()
+            except Exception:
+                logger.exception("Cache invalidation listener failed, reconnecting")
+            await asyncio.sleep(RECONNECT_DELAY)
+
+    async def _listen(self) -> None:
+        conn = await run_in_threadpool(_connect)
+        readable = asyncio.Event()
+        self._loop.add_reader(conn.fileno(), readable.set)
+        try:
+            # Anything invalidated while we were not listening is unknown
+            for cache in caches.values():
+                cache.drop()
+
+            while True:
+                try:
+                    await asyncio.wait_for(readable.wait(), timeout=KEEPALIVE_INTERVAL)
+                except asyncio.TimeoutError:
+                    await run_in_threadpool(_ping, conn)
+                readable.clear()
+                conn.poll()
+                while conn.notifies:
+                    _apply(conn.notifies.pop(0).payload)
+        finally:
+            self._loop.remove_reader(conn.fileno())
+            conn.close()
+
+
+channel = CacheInvalidationChannel()
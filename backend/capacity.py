@@ -0,0 +1,71 @@
+"""Stock reservations against per-batch product capacities.
+
+Capacity rows are locked in product order with SELECT ... FOR UPDATE, so
+concurrent orders for overlapping products queue up on the rows instead of
+deadlocking. The reservation itself is a conditional UPDATE
+(``reserved + quantity <= capacity``), which also keeps the check atomic on
+databases without row locks. Rows without a capacity are not limited but
+still count their reserved units.
+"""
+
+from typing import Dict
+
+from fastapi import HTTPException, status
+from sqlalchemy import case, or_, update
+from sqlalchemy.orm import Session
+
+from models import Batch, BatchCapacity
+
+
+def reserve_capacity(
+    db: Session, batch_slug: str, quantities: Dict[int, int], names: Dict[int, str]
+) -> None:
+    """Reserve ``quantities`` (product id -> units) in a batch.
+
+    Raises a 409 naming the products that are sold out, after which the caller
+    must roll back. Products without a capacity are not limited.
+    """
+    rows = (
+        db.query(BatchCapacity)
+        .join(Batch, Batch.id == BatchCapacity.batch_id)
+        .filter(Batch.slug == batch_slug, BatchCapacity.product_id.in_(quantities))
+        .order_by(BatchCapacity.batch_id, BatchCapacity.product_id)
+        .with_for_update(of=BatchCapacity)
+        .all()
+    )
+    if not rows:
+        return
+
+    short = [
+        f"{names[row.product_id]} (nog {row.remaining} beschikbaar)"
+        for row in rows
+        if row.capacity is not None
+        and row.reserved + quantities[row.product_id] > row.capacity
+    ]
+    if not short:
+        quantity = case(
+            {row.product_id: quantities[row.product_id] for row in rows},
+            value=BatchCapacity.product_id,
+        )
+        result = db.execute(
+            update(BatchCapacity)
+            .where(
+                BatchCapacity.batch_id == rows[0].batch_id,
+                BatchCapacity.product_id.in_([row.product_id for row in rows]),
+                or_(
+                    BatchCapacity.capacity.is_(None),
+                    BatchCapacity.reserved + quantity <= BatchCapacity.capacity,
+                ),
+            )
+            .values(reserved=BatchCapacity.reserved + quantity),
+            execution_options={"synchronize_session": False},
+        )
+        if result.rowcount == len(rows):
+            return
+        # Only reachable without row locks: someone reserved in between
+        short = [names[row.product_id] for row in rows]
+
+    raise HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail=f"Niet genoeg voorraad: {', '.join(short)}",
+    )
@@ -1,7 +1,15 @@
 import os
-from sqlalchemy import create_engine
+import threading
+import time
+from typing import Any, Callable, Dict, TypeVar
+
+from sqlalchemy import create_engine, event, exc
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from starlette.concurrency import run_in_threadpool
+
+T = TypeVar("T")
 
 # Get database URL from environment variable (Railway sets this automatically)
 DATABASE_URL = os.getenv("DATABASE_URL")
@@ -10,17 +18,160 @@ DATABASE_URL = os.getenv("DATABASE_URL")
 if DATABASE_URL and DATABASE_URL.startswith("postgres://"):
     DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
 
+# Serve the public API routers through an async driver (asyncpg/aiosqlite)
+# instead of running blocking queries in the threadpool
+DATABASE_ASYNC = os.getenv("DATABASE_ASYNC", "false").lower() == "true"
+
+ASYNC_DRIVERS = {"postgresql": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}
+
+# Connection pool settings. Railway drops idle Postgres connections, so
+# connections are pinged on checkout and recycled well before that happens.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "300"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+
+
+class PoolStats:
+    """Counters for one connection pool, exposed on /health"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.invalidations = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def record_wait(self, seconds: float, timed_out: bool = False) -> None:
+        with self._lock:
+            self.wait_seconds_total += seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+            if timed_out:
+                self.timeouts += 1
+
+    def count(self, counter: str) -> None:
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def as_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "connects": self.connects,
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "invalidations": self.invalidations,
+                "timeouts": self.timeouts,
+                "wait_seconds_total": round(self.wait_seconds_total, 6),
+                "wait_seconds_max": round(self.wait_seconds_max, 6),
+            }
+
+
+# Counters for the sync and async engine pools
+pool_stats = PoolStats()
+async_pool_stats = PoolStats()
+
+
+class _MeteredPoolMixin:
+    """Records how long checkouts wait for a free connection"""
+
+    stats: PoolStats
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            self.stats.record_wait(time.perf_counter() - start, timed_out=True)
+            raise
+        self.stats.record_wait(time.perf_counter() - start)
+        return connection
+
+
+class MeteredQueuePool(_MeteredPoolMixin, QueuePool):
+    stats = pool_stats
+
+
+class MeteredAsyncPool(_MeteredPoolMixin, AsyncAdaptedQueuePool):
+    stats = async_pool_stats
+
+
+def _pool_options(url: str, poolclass: type) -> Dict[str, Any]:
+    """Pool keyword arguments for create_engine, from the DB_POOL_* settings."""
+    if url.startswith("sqlite"):
+        # SQLite is only used for local development; keep its default pool
+        return {}
+    return {
+        "poolclass": poolclass,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+
+def _track_pool_events(sync_engine, stats: PoolStats) -> None:
+    event.listen(sync_engine, "connect", lambda *args: stats.count("connects"))
+    event.listen(sync_engine, "checkout", lambda *args: stats.count("checkouts"))
+    event.listen(sync_engine, "checkin", lambda *args: stats.count("checkins"))
+    event.listen(sync_engine, "invalidate", lambda *args: stats.count("invalidations"))
+
+
 # Create engine
 engine = None
 SessionLocal = None
+async_engine = None
+AsyncSessionLocal = None
 
 if DATABASE_URL:
-    engine = create_engine(DATABASE_URL)
+    engine = create_engine(DATABASE_URL, **_pool_options(DATABASE_URL, MeteredQueuePool))
+    _track_pool_events(engine, pool_stats)
     SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+if DATABASE_URL and DATABASE_ASYNC:
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    scheme, rest = DATABASE_URL.split("://", 1)
+    async_scheme = ASYNC_DRIVERS.get(scheme.split("+")[0], scheme)
+    async_url = f"{async_scheme}://{rest}"
+    async_engine = create_async_engine(
+        async_url, **_pool_options(async_url, MeteredAsyncPool)
+    )
+    _track_pool_events(async_engine.sync_engine, async_pool_stats)
+    AsyncSessionLocal = async_sessionmaker(
+        async_engine, autocommit=False, autoflush=False, expire_on_commit=False
+    )
+
 Base = declarative_base()
 
 
+def _pool_status(pool, stats: PoolStats) -> Dict[str, Any]:
+    status: Dict[str, Any] = {"pool": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update(
+            size=pool.size(),
+            checked_out=pool.checkedout(),
+            checked_in=pool.checkedin(),
+            overflow=pool.overflow(),
+        )
+    status.update(stats.as_dict())
+    return status
+
+
+def pool_status() -> Dict[str, Any]:
+    """Current connection pool usage for the configured engines."""
+    status: Dict[str, Any] = {}
+    if engine is not None:
+        status["sync"] = _pool_status(engine.pool, pool_stats)
+    if async_engine is not None:
+        status["async"] = _pool_status(async_engine.sync_engine.pool, async_pool_stats)
+    return status
+
+
 def get_db():
     """Dependency to get database session"""
     if SessionLocal is None:
@@ -30,3 +181,37 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+class AsyncDB:
+    """Runs synchronous ORM code from async route handlers without blocking.
+
+    With DATABASE_ASYNC the work runs on the async driver via
+    ``AsyncSession.run_sync``; otherwise it is handed to the threadpool. Either
+    way the callable receives a regular ``Session``, so query helpers are
+    shared with the sync admin routes.
+    """
+
+    def __init__(self, session: Any):
+        self.session = session
+
+    async def run(self, fn: Callable[..., T], *args: Any) -> T:
+        if AsyncSessionLocal is not None:
+            return await self.session.run_sync(fn, *args)
+        return await run_in_threadpool(fn, self.session, *args)
+
+
+async def get_async_db():
+    """Dependency to get an AsyncDB runner for async route handlers"""
+    if AsyncSessionLocal is not None:
+        async with AsyncSessionLocal() as session:
+            yield AsyncDB(session)
+        return
+
+    if SessionLocal is None:
+        raise Exception("Database not configured")
+    db: Session = SessionLocal()
+    try:
+        yield AsyncDB(db)
+    finally:
+        await run_in_threadpool(db.close)
@@ -0,0 +1,259 @@
+"""Durable email outbox.
+
+Order emails are written to the ``email_outbox`` table in the same transaction
+as the order itself. A background dispatcher drains the table, so a slow SMTP
+server never blocks checkout and a crash never loses an email.
+"""
+
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from database import SessionLocal
+from email_service import email_service
+from models import EmailOutbox, EmailStatus
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = int(os.getenv("EMAIL_OUTBOX_MAX_ATTEMPTS", "8"))
+CONCURRENCY = int(os.getenv("EMAIL_OUTBOX_CONCURRENCY", "2"))
+POLL_INTERVAL = float(os.getenv("EMAIL_OUTBOX_POLL_SECONDS", "30"))
+BATCH_SIZE = 20
+
+# Retry backoff: 30s, 1m, 2m, 4m, ... capped at one hour
+BACKOFF_BASE = timedelta(seconds=30)
+BACKOFF_MAX = timedelta(hours=1)
+
+# How long a claimed email stays invisible to other dispatchers while sending
+CLAIM_LEASE = timedelta(minutes=5)
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def queue_email(
+    db: Session,
+    to_email: str,
+    subject: str,
+    html_body: str,
+    text_body: Optional[str] = None,
+) -> Optional[EmailOutbox]:
+    """Add an email to the outbox; it is sent once the caller commits.
+
+    Nothing is queued while SMTP is not configured, since no dispatcher runs
+    to send it.
+    """
+    if not email_service.enabled:
+        logger.warning(f"Email not queued (service disabled): {subject} to {to_email}")
+        return None
+    entry = EmailOutbox(
+        to_email=to_email,
+        subject=subject,
+        html_body=html_body,
+        text_body=text_body,
+        status=EmailStatus.PENDING.value,
+        attempts=0,
+        next_attempt_at=_now(),
+    )
+    db.add(entry)
+    return entry
+
+
+def queue_emails(
+    db: Session, emails: List[Tuple[str, str, str, Optional[str]]]
+) -> int:
+    """Add many (to, subject, html, text) emails to the outbox in one INSERT.
+
+    Returns how many were queued: none while SMTP is not configured.
+    """
+    if not emails:
+        return 0
+    if not email_service.enabled:
+        logger.warning(f"{len(emails)} emails not queued (service disabled)")
+        return 0
+    now = _now()
+    db.execute(
+        insert(EmailOutbox),
+        [
+            {
+                "to_email": to_email,
+                "subject": subject,
+                "html_body": html_body,
+                "text_body": text_body,
+                "status": EmailStatus.PENDING.value,
+                "attempts": 0,
+                "next_attempt_at": now,
+            }
+            for to_email, subject, html_body, text_body in emails
+        ],
+    )
+    return len(emails)
+
+
+def backoff_delay(attempts: int) -> timedelta:
+    """Delay before the next attempt after ``attempts`` failed sends."""
+    return min(BACKOFF_BASE * (2 ** max(attempts - 1, 0)), BACKOFF_MAX)
+
+
+def _claim_due(limit: int) -> List[Dict]:
+    """Claim due emails by pushing their next attempt past the lease."""
+    db = SessionLocal()
+    try:
+        now = _now()
+        entries = (
+            db.query(EmailOutbox)
+            .filter(
+                EmailOutbox.status == EmailStatus.PENDING.value,
+                EmailOutbox.next_attempt_at <= now,
+            )
+            .order_by(EmailOutbox.next_attempt_at.asc())
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+            .all()
+        )
+        claimed = []
+        for entry in entries:
+            entry.attempts += 1
+            entry.next_attempt_at = now + CLAIM_LEASE
+            claimed.append(
+                {
+                    "id": entry.id,
+                    "to_email": entry.to_email,
+                    "subject": entry.subject,
+                    "html_body": entry.html_body,
+                    "text_body": entry.text_body,
+                    "attempts": entry.attempts,
+                }
+            )
+        db.commit()
+        return claimed
+    finally:
+        db.close()
+
+
+def _mark_sent(entry_id: int) -> None:
+    db = SessionLocal()
+    try:
+        db.query(EmailOutbox).filter(EmailOutbox.id == entry_id).update(
+            {
+                EmailOutbox.status: EmailStatus.SENT.value,
+                EmailOutbox.sent_at: _now(),
+                EmailOutbox.last_error: None,
+            },
+            synchronize_session=False,
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+def _mark_failed(entry_id: int, attempts: int, error: str) -> None:
+    """Schedule a retry with backoff, or give up after MAX_ATTEMPTS."""
+    values = {EmailOutbox.last_error: error[:1000]}
+    if attempts >= MAX_ATTEMPTS:
+        values[EmailOutbox.status] = EmailStatus.FAILED.value
+    else:
+        values[EmailOutbox.next_attempt_at] = _now() + backoff_delay(attempts)
+
+    db = SessionLocal()
+    try:
+        db.query(EmailOutbox).filter(EmailOutbox.id == entry_id).update(
+            values, synchronize_session=False
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+class OutboxDispatcher:
+    """Background task that drains the email outbox"""
+
+    def __init__(self, concurrency: int = CONCURRENCY, poll_interval: float = POLL_INTERVAL):
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def start(self) -> None:
+        """Start draining in the background (no-op without DB or SMTP)."""
+        if SessionLocal is None or not email_service.enabled:
+            logger.warning("Email outbox dispatcher not started (database or SMTP not configured)")
+            return
+        if self._task is not None:
+            return
+        self._wakeup = asyncio.Event()
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"Email outbox dispatcher started (concurrency={self.concurrency})")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def wake(self) -> None:
+        """Signal that new emails were committed to the outbox."""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.drain()
+            except Exception:
+                logger.exception("Email outbox dispatcher iteration failed")
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def drain(self) -> int:
+        """Send every email that is currently due; return how many were tried."""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+
+        processed = 0
+        while True:
+            entries = await run_in_threadpool(_claim_due, BATCH_SIZE)
+            if not entries:
+                return processed
+            await asyncio.gather(*(self._deliver(entry) for entry in entries))
+            processed += len(entries)
+
+    async def _deliver(self, entry: Dict) -> None:
+        async with self._semaphore:
+            try:
+                await email_service.deliver(
+                    entry["to_email"],
+                    entry["subject"],
+                    entry["html_body"],
+                    entry["text_body"],
+                )
+            except Exception as e:
+                logger.error(
+                    f"Failed to send outbox email #{entry['id']} to {entry['to_email']} "
+                    f"(attempt {entry['attempts']}): {str(e)}"
+                )
+                await run_in_threadpool(_mark_failed, entry["id"], entry["attempts"], str(e))
+                return
+
+        await run_in_threadpool(_mark_sent, entry["id"])
+
+
+# Global dispatcher instance
+dispatcher = OutboxDispatcher()
@@ -1,16 +1,47 @@
+import asyncio
 import os
-import aiosmtplib
+import time
+from dataclasses import dataclass, field
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from jinja2 import Environment, FileSystemLoader
-from typing import List, Dict
+from typing import TYPE_CHECKING, List, Dict, Optional, Tuple
 import logging
 
+from metrics import SMTP_SEND_DURATION, SMTP_SEND_FAILURES
+from templating import templates
+
+if TYPE_CHECKING:
+    import aiosmtplib
+
 logger = logging.getLogger(__name__)
 
-# Set up Jinja2 environment for email templates
-template_dir = os.path.join(os.path.dirname(__file__), "templates", "email")
-jinja_env = Environment(loader=FileSystemLoader(template_dir))
+# Compile every email template once at startup
+EMAIL_TEMPLATES = {
+    name: templates.get_template(f"email/{name}")
+    for name in (
+        "customer-confirmation.html",
+        "customer-confirmation.txt",
+        "admin-notification.html",
+        "admin-notification.txt",
+        "order-ready.html",
+        "order-ready.txt",
+    )
+}
+
+
+@dataclass
+class OrderEmailContext:
+    """Template context shared by the HTML and text body of an order email"""
+
+    order_id: int
+    name: str
+    batch: str
+    pickup: str
+    items: List[Dict] = field(default_factory=list)
+    total: float = 0.0
+    phone: Optional[str] = None
+    email: Optional[str] = None
+    notes: Optional[str] = None
 
 
 class EmailService:
@@ -25,6 +56,12 @@ class EmailService:
         self.admin_email = os.getenv("ADMIN_EMAIL")
         self.enabled = all([self.smtp_host, self.smtp_user, self.smtp_password])
 
+        # Pool of authenticated SMTP connections, reused across messages
+        self.pool_size = int(os.getenv("SMTP_POOL_SIZE", "3"))
+        self.pool_idle_timeout = float(os.getenv("SMTP_POOL_IDLE_SECONDS", "60"))
+        self._idle_connections: List[Tuple["aiosmtplib.SMTP", float]] = []
+        self._pool_semaphore = asyncio.Semaphore(self.pool_size)
+
         if not self.enabled:
             logger.warning("Email service not configured - emails will not be sent")
 
@@ -39,30 +76,7 @@ class EmailService:
             return False
 
         try:
-            message = MIMEMultipart("alternative")
-            message["From"] = self.from_email
-            message["To"] = to_email
-            message["Subject"] = subject
-
-            # Add text and HTML parts
-            if text_body:
-                message.attach(MIMEText(text_body, "plain", "utf-8"))
-            message.attach(MIMEText(html_body, "html", "utf-8"))
-
-            # Send email - use TLS for port 465, STARTTLS for 587
-            use_tls = self.smtp_port == 465
-            await aiosmtplib.send(
-                message,
-                hostname=self.smtp_host,
-                port=self.smtp_port,
-                username=self.smtp_user,
-                password=self.smtp_password,
-                use_tls=use_tls,  # SSL/TLS for port 465
-                start_tls=(not use_tls),  # STARTTLS for port 587
-                timeout=10,  # 10 second timeout
-            )
-
-            logger.info(f"Email sent successfully to {to_email}: {subject}")
+            await self.deliver(to_email, subject, html_body, text_body)
             return True
 
         except Exception as e:
@@ -70,6 +84,93 @@ class EmailService:
             logger.exception("Full email error traceback:")
             return False
 
+    async def send_bulk(
+        self, emails: List[Tuple[str, str, str, Optional[str]]]
+    ) -> List[bool]:
+        """Send many (to, subject, html, text) emails over the connection pool"""
+        return await asyncio.gather(*(self.send_email(*email) for email in emails))
+
+    async def deliver(
+        self, to_email: str, subject: str, html_body: str, text_body: str = None
+    ) -> None:
+        """Send an email, raising on failure (used by the outbox dispatcher)"""
+        message = MIMEMultipart("alternative")
+        message["From"] = self.from_email
+        message["To"] = to_email
+        message["Subject"] = subject
+
+        # Add text and HTML parts
+        if text_body:
+            message.attach(MIMEText(text_body, "plain", "utf-8"))
+        message.attach(MIMEText(html_body, "html", "utf-8"))
+
+        start = time.perf_counter()
+        async with self._pool_semaphore:
+            client = None
+            try:
+                # Connecting and logging in count as part of the send
+                client = await self._checkout_connection()
+                try:
+                    await client.send_message(message)
+                except ConnectionError:
+                    # Pooled connection was dropped by the server; reconnect once
+                    self._discard_connection(client)
+                    client = await self._open_connection()
+                    await client.send_message(message)
+            except Exception:
+                if client is not None:
+                    self._discard_connection(client)
+                SMTP_SEND_FAILURES.inc()
+                raise
+            finally:
+                SMTP_SEND_DURATION.observe(time.perf_counter() - start)
+            self._idle_connections.append((client, time.monotonic()))
+
+        logger.info(f"Email sent successfully to {to_email}: {subject}")
+
+    async def close(self) -> None:
+        """Close all pooled SMTP connections"""
+        idle, self._idle_connections = self._idle_connections, []
+        for client, _ in idle:
+            try:
+                await client.quit()
+            except Exception:
+                self._discard_connection(client)
+
+    async def _open_connection(self) -> "aiosmtplib.SMTP":
+        """Open and authenticate a new SMTP connection"""
+        # Imported on first send; most processes never open an SMTP connection
+        import aiosmtplib
+
+        # Use TLS for port 465, STARTTLS for 587
+        use_tls = self.smtp_port == 465
+        client = aiosmtplib.SMTP(
+            hostname=self.smtp_host,
+            port=self.smtp_port,
+            username=self.smtp_user,
+            password=self.smtp_password,
+            use_tls=use_tls,  # SSL/TLS for port 465
+            start_tls=(not use_tls),  # STARTTLS for port 587
+            timeout=10,  # 10 second timeout
+        )
+        await client.connect()  # also logs in with the configured credentials
+        return client
+
+    async def _checkout_connection(self) -> "aiosmtplib.SMTP":
+        """Reuse a recent idle connection, or open a new one"""
+        now = time.monotonic()
+        while self._idle_connections:
+            client, last_used = self._idle_connections.pop()
+            if client.is_connected and now - last_used < self.pool_idle_timeout:
+                return client
+            self._discard_connection(client)
+        return await self._open_connection()
+
+    @staticmethod
+    def _discard_connection(client: "aiosmtplib.SMTP") -> None:
+        if client.is_connected:
+            client.close()
+
     async def send_order_confirmation_to_customer(
         self,
         customer_email: str,
@@ -81,17 +182,9 @@ class EmailService:
         total: float,
     ) -> bool:
         """Send order confirmation email to customer"""
-
-        subject = "Bevestiging bestelling - Akkervarken.be"
-
-        html_body = self._render_customer_confirmation_html(
-            customer_name, order_id, batch_name, pickup_info, items, total
-        )
-
-        text_body = self._render_customer_confirmation_text(
+        subject, html_body, text_body = self.render_order_confirmation_to_customer(
             customer_name, order_id, batch_name, pickup_info, items, total
         )
-
         return await self.send_email(customer_email, subject, html_body, text_body)
 
     async def send_order_notification_to_admin(
@@ -107,22 +200,7 @@ class EmailService:
         notes: str = None,
     ) -> bool:
         """Send new order notification to admin"""
-
-        subject = f"Nieuwe bestelling #{order_id} - {customer_name}"
-
-        html_body = self._render_admin_notification_html(
-            order_id,
-            customer_name,
-            customer_phone,
-            customer_email,
-            batch_name,
-            pickup_info,
-            items,
-            total,
-            notes,
-        )
-
-        text_body = self._render_admin_notification_text(
+        subject, html_body, text_body = self.render_order_notification_to_admin(
             order_id,
             customer_name,
             customer_phone,
@@ -133,100 +211,91 @@ class EmailService:
             total,
             notes,
         )
-
         return await self.send_email(self.admin_email, subject, html_body, text_body)
 
-    def _render_customer_confirmation_html(
+    def render_order_confirmation_to_customer(
         self,
-        name: str,
+        customer_name: str,
         order_id: int,
-        batch: str,
-        pickup: str,
+        batch_name: str,
+        pickup_info: str,
         items: List[Dict],
         total: float,
-    ) -> str:
-        """Render customer confirmation email HTML"""
-        template = jinja_env.get_template("customer-confirmation.html")
-        return template.render(
-            name=name,
-            order_id=order_id,
-            batch=batch,
-            pickup=pickup,
-            items=items,
-            total=total,
-        )
+    ) -> Tuple[str, str, str]:
+        """Render subject, HTML and text body of the customer confirmation"""
 
-    def _render_customer_confirmation_text(
-        self,
-        name: str,
-        order_id: int,
-        batch: str,
-        pickup: str,
-        items: List[Dict],
-        total: float,
-    ) -> str:
-        """Render customer confirmation email plain text"""
-        template = jinja_env.get_template("customer-confirmation.txt")
-        return template.render(
-            name=name,
+        subject = "Bevestiging bestelling - Akkervarken.be"
+
+        context = OrderEmailContext(
             order_id=order_id,
-            batch=batch,
-            pickup=pickup,
+            name=customer_name,
+            batch=batch_name,
+            pickup=pickup_info,
             items=items,
             total=total,
         )
+        html_body, text_body = self._render("customer-confirmation", context)
+
+        return subject, html_body, text_body
 
-    def _render_admin_notification_html(
+    def render_order_notification_to_admin(
         self,
         order_id: int,
-        name: str,
-        phone: str,
-        email: str,
-        batch: str,
-        pickup: str,
+        customer_name: str,
+        customer_phone: str,
+        customer_email: str,
+        batch_name: str,
+        pickup_info: str,
         items: List[Dict],
         total: float,
         notes: str = None,
-    ) -> str:
-        """Render admin notification email HTML"""
-        template = jinja_env.get_template("admin-notification.html")
-        return template.render(
+    ) -> Tuple[str, str, str]:
+        """Render subject, HTML and text body of the admin notification"""
+
+        subject = f"Nieuwe bestelling #{order_id} - {customer_name}"
+
+        context = OrderEmailContext(
             order_id=order_id,
-            name=name,
-            phone=phone,
-            email=email,
-            batch=batch,
-            pickup=pickup,
+            name=customer_name,
+            batch=batch_name,
+            pickup=pickup_info,
             items=items,
             total=total,
+            phone=customer_phone,
+            email=customer_email,
             notes=notes,
         )
+        html_body, text_body = self._render("admin-notification", context)
 
-    def _render_admin_notification_text(
+        return subject, html_body, text_body
+
+    def render_order_ready_to_customer(
         self,
+        customer_name: str,
         order_id: int,
-        name: str,
-        phone: str,
-        email: str,
-        batch: str,
-        pickup: str,
-        items: List[Dict],
-        total: float,
-        notes: str = None,
-    ) -> str:
-        """Render admin notification email plain text"""
-        template = jinja_env.get_template("admin-notification.txt")
-        return template.render(
+        batch_name: str,
+        pickup_info: str,
+    ) -> Tuple[str, str, str]:
+        """Render subject, HTML and text body of the ready-for-pickup notice"""
+
+        subject = f"Je bestelling #{order_id} ligt klaar - Akkervarken.be"
+
+        context = OrderEmailContext(
             order_id=order_id,
-            name=name,
-            phone=phone,
-            email=email,
-            batch=batch,
-            pickup=pickup,
-            items=items,
-            total=total,
-            notes=notes,
+            name=customer_name,
+            batch=batch_name,
+            pickup=pickup_info,
         )
+        html_body, text_body = self._render("order-ready", context)
+
+        return subject, html_body, text_body
+
+    def _render(self, template: str, context: OrderEmailContext) -> Tuple[str, str]:
+        """Render the HTML and plain text variant of a template from one context"""
+        variables = vars(context)
+        html_body = EMAIL_TEMPLATES[f"{template}.html"].render(variables)
+        text_body = EMAIL_TEMPLATES[f"{template}.txt"].render(variables)
+        return html_body, text_body
 
 
 # Global email service instance
@@ -1,10 +1,17 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from sqlalchemy import text
 import os
 import logging
-from database import engine
+import time
+from availability import broadcaster as availability_broadcaster
+from cache_invalidation import channel as cache_invalidation
+from database import async_engine, engine, pool_status
+from email_outbox import dispatcher as outbox_dispatcher
+from email_service import email_service
+from migrate import migrate
+from metrics import CONTENT_TYPE_LATEST, MetricsMiddleware, metrics_response_body
 from orders import router as orders_router
 from admin import router as admin_router
 from products import router as products_router
@@ -23,30 +30,48 @@ app = FastAPI(
 )
 
 
+# Migrations normally run once per deploy via `python migrate.py`; workers only
+# do a cheap "already at head" check unless this is disabled
+MIGRATE_ON_STARTUP = os.getenv("MIGRATE_ON_STARTUP", "true").lower() == "true"
+
+
 @app.on_event("startup")
 async def startup_event():
-    """Run database migrations on startup"""
+    """Make sure the database is migrated and start background tasks"""
+    start = time.perf_counter()
     logger.info("Running startup tasks...")
 
-    # Run database migrations using Alembic API
-    try:
-        logger.info("Running database migrations...")
+    if MIGRATE_ON_STARTUP and engine is not None:
+        try:
+            if migrate():
+                logger.info("✅ Migrations completed successfully")
+        except Exception as e:
+            logger.error(f"❌ Migration failed: {str(e)}")
+            logger.exception("Full migration error traceback:")
+            # Don't crash the app, just log the error
+            # This allows the API to still start if migrations fail
+
+    # Start draining queued order emails in the background
+    outbox_dispatcher.start()
 
-        from alembic.config import Config
-        from alembic import command
+    # Keep cached catalog/batch documents in sync with the other workers
+    cache_invalidation.start()
 
-        # Create Alembic config
-        alembic_cfg = Config("alembic.ini")
+    # Push stock changes to open webshop pages
+    availability_broadcaster.start()
 
-        # Run upgrade to head
-        command.upgrade(alembic_cfg, "head")
+    logger.info(f"Startup tasks finished in {(time.perf_counter() - start) * 1000:.0f} ms")
 
-        logger.info("✅ Migrations completed successfully")
-    except Exception as e:
-        logger.error(f"❌ Migration failed: {str(e)}")
-        logger.exception("Full migration error traceback:")
-        # Don't crash the app, just log the error
-        # This allows the API to still start if migrations fail
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop background tasks and close pooled SMTP and database connections"""
+    await outbox_dispatcher.stop()
+    await availability_broadcaster.stop()
+    await cache_invalidation.stop()
+    await email_service.close()
+    if async_engine is not None:
+        await async_engine.dispose()
 
 
 # CORS setup - allow requests from your website
@@ -73,6 +98,9 @@ app.add_middleware(
     expose_headers=["*"],
 )
 
+# Request count, latency and DB usage per route, exported at /metrics
+app.add_middleware(MetricsMiddleware)
+
 # Static files (shared admin assets, etc.)
 STATIC_DIR = os.path.join(os.path.dirname(__file__), "static")
 if os.path.isdir(STATIC_DIR):
@@ -117,10 +145,17 @@ def health_check():
             health_status["database"] = "error"
             health_status["database_error"] = str(e)
             health_status["status"] = "unhealthy"
+        health_status["database_pool"] = pool_status()
 
     return health_status
 
 
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Prometheus metrics endpoint"""
+    return Response(content=metrics_response_body(), media_type=CONTENT_TYPE_LATEST)
+
+
 @app.get("/debug/cors")
 def cors_debug():
     """Debug endpoint to check CORS configuration"""
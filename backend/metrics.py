@@ -0,0 +1,253 @@
+"""Prometheus metrics for HTTP requests, database queries and SMTP sends.
+
+Exported in the Prometheus text format at /metrics. Requests are labelled by
+their route template (e.g. /api/batches/{batch_slug}), never the raw path, to
+keep the number of series bounded.
+
+Queries slower than DB_SLOW_QUERY_MS are logged with the route that issued
+them. With DB_DEBUG=true responses also carry X-DB-Queries / X-DB-Time
+headers, and statements repeated within one request (N+1 lazy loads) are
+logged.
+"""
+
+import logging
+import os
+import time
+from collections import Counter as StatementCounter
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Optional
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+from prometheus_client.core import GaugeMetricFamily
+from sqlalchemy import event
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from database import async_engine, engine, pool_status
+
+logger = logging.getLogger(__name__)
+
+DB_DEBUG = os.getenv("DB_DEBUG", "false").lower() == "true"
+DB_SLOW_QUERY_MS = float(os.getenv("DB_SLOW_QUERY_MS", "500"))
+DB_REPEATED_QUERY_THRESHOLD = int(os.getenv("DB_REPEATED_QUERY_THRESHOLD", "5"))
+
+HTTP_REQUESTS = Counter(
+    "http_requests_total",
+    "HTTP requests by route and status code",
+    ["method", "route", "status"],
+)
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route",
+    ["method", "route"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+HTTP_REQUESTS_IN_FLIGHT = Gauge(
+    "http_requests_in_flight", "HTTP requests currently being served"
+)
+
+DB_QUERY_DURATION = Histogram(
+    "db_query_duration_seconds",
+    "Duration of single database queries",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+DB_REQUEST_QUERIES = Histogram(
+    "db_request_queries",
+    "Database queries issued per HTTP request",
+    ["route"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100),
+)
+DB_REQUEST_DURATION = Histogram(
+    "db_request_duration_seconds",
+    "Total database time per HTTP request",
+    ["route"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+
+SMTP_SEND_DURATION = Histogram(
+    "smtp_send_duration_seconds",
+    "SMTP send latency, including connection checkout",
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+SMTP_SEND_FAILURES = Counter("smtp_send_failures_total", "Failed SMTP sends")
+
+AVAILABILITY_SUBSCRIBERS = Gauge(
+    "availability_stream_subscribers", "Open batch availability event streams"
+)
+
+
+@dataclass
+class RequestStats:
+    """Database work done while serving one request"""
+
+    scope: Scope
+    queries: int = 0
+    db_seconds: float = 0.0
+    # Executions per statement, only tracked with DB_DEBUG
+    statements: StatementCounter = field(default_factory=StatementCounter)
+
+    @property
+    def route(self) -> str:
+        # The router stores the matched route in the scope
+        route = self.scope.get("route")
+        return getattr(route, "path", "unmatched")
+
+
+# Stats of the request being served. Threadpool and run_sync calls inherit the
+# context, so queries issued there are attributed to the right request.
+current_request_stats: ContextVar[Optional[RequestStats]] = ContextVar(
+    "current_request_stats", default=None
+)
+
+
+# Start times of the statements running on a connection, by cursor. Kept in
+# conn.info, which lives as long as the pooled DBAPI connection.
+_START_TIMES = "query_start_times"
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault(_START_TIMES, {})[id(cursor)] = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = conn.info.get(_START_TIMES, {}).pop(id(cursor), None)
+    if start is None:
+        return  # dropped by _handle_error
+    elapsed = time.perf_counter() - start
+    DB_QUERY_DURATION.observe(elapsed)
+    stats = current_request_stats.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_seconds += elapsed
+        if DB_DEBUG:
+            stats.statements[statement] += 1
+
+    if elapsed * 1000 >= DB_SLOW_QUERY_MS:
+        logger.warning(
+            "Slow query (%.0f ms) from %s: %s",
+            elapsed * 1000,
+            f"{stats.scope['method']} {stats.route}" if stats else "outside a request",
+            " ".join(statement.split()),
+        )
+
+
+def _handle_error(exception_context) -> None:
+    # A statement that raises never reaches after_cursor_execute, and neither
+    # does a statement it ran inside (e.g. a column default), so drop them all
+    conn = exception_context.connection
+    if conn is not None:
+        conn.info.pop(_START_TIMES, None)
+
+
+def _log_repeated_statements(stats: RequestStats) -> None:
+    """Log statements executed suspiciously often within one request."""
+    for statement, count in stats.statements.items():
+        if count >= DB_REPEATED_QUERY_THRESHOLD:
+            logger.warning(
+                "Possible N+1: statement ran %d times in %s %s: %s",
+                count,
+                stats.scope["method"],
+                stats.route,
+                " ".join(statement.split()),
+            )
+
+
+def instrument_engine(sync_engine) -> None:
+    """Time every query run through a (sync) engine."""
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(sync_engine, "handle_error", _handle_error)
+
+
+if engine is not None:
+    instrument_engine(engine)
+if async_engine is not None:
+    instrument_engine(async_engine.sync_engine)
+
+
+POOL_METRICS = {
+    "size": "Persistent connections the pool keeps",
+    "checked_out": "Connections currently in use",
+    "checked_in": "Idle connections in the pool",
+    "overflow": "Connections opened beyond the pool size",
+    "connects": "Connections opened since start",
+    "checkouts": "Connection checkouts since start",
+    "invalidations": "Connections invalidated since start",
+    "timeouts": "Checkouts that timed out waiting for a connection",
+    "wait_seconds_total": "Total time spent waiting for a connection",
+    "wait_seconds_max": "Longest wait for a connection",
+}
+
+
+class PoolCollector:
+    """Exports the connection pool numbers from database.pool_status()"""
+
+    def collect(self):
+        status = pool_status()
+        for name, documentation in POOL_METRICS.items():
+            family = GaugeMetricFamily(f"db_pool_{name}", documentation, labels=["engine"])
+            for engine_name, engine_status in status.items():
+                if name in engine_status:
+                    family.add_metric([engine_name], engine_status[name])
+            yield family
+
+
+REGISTRY.register(PoolCollector())
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording request counts, latency and DB usage per route"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(scope)
+        token = current_request_stats.set(stats)
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if DB_DEBUG:
+                    message["headers"] = [
+                        *message.get("headers", []),
+                        (b"x-db-queries", str(stats.queries).encode()),
+                        (b"x-db-time", f"{stats.db_seconds * 1000:.1f}ms".encode()),
+                    ]
+            await send(message)
+
+        HTTP_REQUESTS_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            HTTP_REQUESTS_IN_FLIGHT.dec()
+            current_request_stats.reset(token)
+            if DB_DEBUG:
+                _log_repeated_statements(stats)
+
+            route_path = stats.route
+            method = scope["method"]
+            HTTP_REQUESTS.labels(method, route_path, str(status_code)).inc()
+            HTTP_REQUEST_DURATION.labels(method, route_path).observe(elapsed)
+            DB_REQUEST_QUERIES.labels(route_path).observe(stats.queries)
+            DB_REQUEST_DURATION.labels(route_path).observe(stats.db_seconds)
+
+
+def metrics_response_body() -> bytes:
+    """Current metrics in the Prometheus text format."""
+    return generate_latest(REGISTRY)
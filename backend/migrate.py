@@ -0,0 +1,121 @@
+"""Database migration entry point.
+
+Run before the web workers start (Railway preDeployCommand):
+    python migrate.py
+
+Checking whether the database is already at head only reads the
+alembic_version table and the revision ids in alembic/versions, so it is cheap
+enough to run on every worker boot. Alembic itself is only imported when an
+upgrade is actually needed, and on PostgreSQL an advisory lock makes sure only
+one process migrates at a time.
+"""
+
+import glob
+import logging
+import os
+import re
+import time
+from typing import Set
+
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+
+from database import engine
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+VERSIONS_DIR = os.path.join(BASE_DIR, "alembic", "versions")
+
+# Arbitrary application-wide key for pg_advisory_lock
+MIGRATION_LOCK_ID = 7_340_117_001
+
+_REVISION_RE = re.compile(r'^revision\s*=\s*["\'](\w+)["\']', re.MULTILINE)
+_DOWN_REVISION_RE = re.compile(r"^down_revision\s*=\s*(.+)$", re.MULTILINE)
+
+
+def head_revisions() -> Set[str]:
+    """Head revision ids, read from the migration files without importing them."""
+    revisions = set()
+    parents = set()
+    for path in glob.glob(os.path.join(VERSIONS_DIR, "*.py")):
+        with open(path, encoding="utf-8") as f:
+            source = f.read()
+        revision = _REVISION_RE.search(source)
+        if revision is None:
+            continue
+        revisions.add(revision.group(1))
+        down_revision = _DOWN_REVISION_RE.search(source)
+        if down_revision is not None:
+            parents.update(re.findall(r'["\'](\w+)["\']', down_revision.group(1)))
+    return revisions - parents
+
+
+def current_revisions(conn) -> Set[str]:
+    """Revision ids recorded in the database (empty for a fresh database)."""
+    try:
+        rows = conn.execute(text("SELECT version_num FROM alembic_version")).all()
+    except DBAPIError:
+        # No alembic_version table yet
+        conn.rollback()
+        return set()
+    return {row[0] for row in rows}
+
+
+def is_at_head() -> bool:
+    with engine.connect() as conn:
+        return current_revisions(conn) == head_revisions()
+
+
+def _upgrade() -> None:
+    # Imported lazily: loading Alembic and every migration module is the slow
+    # part, and is only needed when there is something to apply
+    from alembic import command
+    from alembic.config import Config
+
+    config = Config(os.path.join(BASE_DIR, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(BASE_DIR, "alembic"))
+    command.upgrade(config, "head")
+
+
+def migrate() -> bool:
+    """Upgrade the database to head if needed. Returns True if it was upgraded."""
+    if engine is None:
+        raise Exception("Database not configured")
+
+    if is_at_head():
+        logger.info("Database is already at head, no migrations to run")
+        return False
+
+    if engine.dialect.name != "postgresql":
+        _upgrade()
+        return True
+
+    # Hold the lock on its own connection while Alembic migrates on another
+    with engine.connect() as lock_conn:
+        lock_conn.execute(text("SELECT pg_advisory_lock(:id)"), {"id": MIGRATION_LOCK_ID})
+        try:
+            # Another process may have migrated while we waited for the lock
+            if is_at_head():
+                logger.info("Database was migrated by another process")
+                return False
+            _upgrade()
+            return True
+        finally:
+            lock_conn.execute(
+                text("SELECT pg_advisory_unlock(:id)"), {"id": MIGRATION_LOCK_ID}
+            )
+            lock_conn.commit()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+    )
+    start = time.perf_counter()
+    upgraded = migrate()
+    logger.info(
+        "%s in %.0f ms",
+        "Migrations applied" if upgraded else "Migration check done",
+        (time.perf_counter() - start) * 1000,
+    )
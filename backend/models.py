@@ -1,19 +1,24 @@
 from sqlalchemy import (
     Boolean,
+    CheckConstraint,
     Column,
     DateTime,
     Enum,
     Float,
     ForeignKey,
+    Index,
     Integer,
     String,
     Table,
     Text,
+    literal_column,
+    select,
 )
-from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
+from sqlalchemy.orm import column_property, relationship
+from sqlalchemy.sql import func, text
 from database import Base
 import enum
+from typing import Optional
 
 
 class OrderStatus(str, enum.Enum):
@@ -25,22 +30,84 @@ class OrderStatus(str, enum.Enum):
     PICKED_UP = "picked up"
 
 
+# Phone number without separators, so "0494 12 34 56" finds "+32 494 12 34 56".
+# A literal SQL expression, so queries match the trigram index built on it.
+ORDER_PHONE_DIGITS = literal_column(
+    "replace(replace(replace(replace(replace("
+    "customer_phone, ' ', ''), '.', ''), '/', ''), '-', ''), '+', '')"
+)
+
+
+# Orders that still need work before or at pickup
+ACTIVE_ORDER_STATUSES = (
+    OrderStatus.PENDING,
+    OrderStatus.CONFIRMED,
+    OrderStatus.READY_FOR_PICKUP,
+)
+
+
 class Order(Base):
     """Customer order from webshop"""
 
     __tablename__ = "orders"
+    __table_args__ = (
+        # Indexes follow the order listing access paths: optional batch and/or
+        # status filter, sorted newest first with id as tie-breaker.
+        Index("ix_orders_created_at_id", "created_at", "id"),
+        Index("ix_orders_batch_id_created_at_id", "batch_id", "created_at", "id"),
+        Index("ix_orders_status_created_at_id", "status", "created_at", "id"),
+        Index(
+            "ix_orders_batch_id_status_created_at_id",
+            "batch_id",
+            "status",
+            "created_at",
+            "id",
+        ),
+        # Active orders per batch (pick lists, pickup day), PostgreSQL only
+        Index(
+            "ix_orders_active_batch_id_created_at",
+            "batch_id",
+            "created_at",
+            postgresql_where=text(
+                "status IN ('pending', 'confirmed', 'ready for pickup')"
+            ),
+        ),
+        # Substring search (ILIKE '%...%') on customer details, PostgreSQL
+        # pg_trgm; on SQLite these are plain indexes and search scans
+        Index(
+            "ix_orders_customer_name_trgm",
+            "customer_name",
+            postgresql_using="gin",
+            postgresql_ops={"customer_name": "gin_trgm_ops"},
+        ),
+        Index(
+            "ix_orders_customer_email_trgm",
+            "customer_email",
+            postgresql_using="gin",
+            postgresql_ops={"customer_email": "gin_trgm_ops"},
+        ),
+        Index(
+            "ix_orders_customer_phone_digits_trgm",
+            ORDER_PHONE_DIGITS.label("customer_phone_digits"),
+            postgresql_using="gin",
+            postgresql_ops={"customer_phone_digits": "gin_trgm_ops"},
+        ),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     customer_name = Column(String(255), nullable=False)
     customer_phone = Column(String(50), nullable=True)
     customer_email = Column(String(255), nullable=True)
-    batch_id = Column(String(100), nullable=False, index=True)
+    batch_id = Column(String(100), nullable=False)
     notes = Column(String(1000), nullable=True)
+    # Stored by value, matching the orderstatus type created in migration 006
     status = Column(
-        Enum(OrderStatus), default=OrderStatus.PENDING, nullable=False, index=True
+        Enum(OrderStatus, values_callable=lambda statuses: [s.value for s in statuses]),
+        default=OrderStatus.PENDING,
+        nullable=False,
     )
     created_at = Column(
-        DateTime(timezone=True), server_default=func.now(), nullable=False, index=True
+        DateTime(timezone=True), server_default=func.now(), nullable=False
     )
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
@@ -49,44 +116,26 @@ class Order(Base):
         "OrderItem", back_populates="order", cascade="all, delete-orphan"
     )
 
+    # Batch lookup by slug (orders store the batch slug, not its primary key)
+    batch = relationship(
+        "Batch",
+        primaryjoin="foreign(Order.batch_id) == Batch.slug",
+        viewonly=True,
+        uselist=False,
+    )
+
     @property
     def batch_name(self) -> str:
-        """Get batch name from batch_id lookup."""
-        # Try to find batch in database
-        from sqlalchemy.orm import object_session
-        session = object_session(self)
-        if session:
-            batch = session.query(Batch).filter(Batch.slug == self.batch_id).first()
-            if batch:
-                return batch.name
+        """Get batch name from the related batch."""
+        if self.batch:
+            return self.batch.name
         # Fallback to batch_id if not found
         return self.batch_id
 
     @property
     def pickup_info(self) -> str:
         """Get pickup information from batch."""
-        from sqlalchemy.orm import object_session
-        session = object_session(self)
-        if session:
-            batch = session.query(Batch).filter(Batch.slug == self.batch_id).first()
-            if batch:
-                if batch.pickup_text:
-                    return batch.pickup_text
-                if batch.pickup_slots:
-                    slots = sorted(batch.pickup_slots, key=lambda s: s.sort_order)
-                    return ", ".join([f"{s.date} {s.time}" for s in slots])
-                return batch.pickup_location
-        return ""
-
-    @property
-    def total_amount(self) -> float:
-        """Calculate total amount from order items."""
-        return sum(item.computed_subtotal for item in self.items)
-
-    @property
-    def total_items(self) -> int:
-        """Calculate total number of items."""
-        return sum(item.quantity for item in self.items)
+        return self.batch.pickup_info if self.batch else ""
 
     def __repr__(self):
         return f"<Order {self.id}: {self.customer_name} - {self.batch_name} - €{self.total_amount}>"
@@ -101,6 +150,9 @@ class OrderItem(Base):
     order_id = Column(Integer, ForeignKey("orders.id"), nullable=False, index=True)
     product_id = Column(Integer, ForeignKey("products.id"), nullable=False, index=True)
     quantity = Column(Integer, nullable=False)
+    # Price at order time, so later price changes do not alter old orders
+    unit_price = Column(Float, nullable=False)
+    subtotal = Column(Float, nullable=False)
 
     # Relationships
     order = relationship("Order", back_populates="items")
@@ -120,18 +172,6 @@ class OrderItem(Base):
     def product_slug(self) -> str:
         return self.product.slug if self.product else ""
 
-    @property
-    def unit_price(self) -> float:
-        return float(self.product.price) if self.product else 0.0
-
-    @property
-    def subtotal(self) -> float:
-        return self.computed_subtotal
-
-    @property
-    def computed_subtotal(self) -> float:
-        return self.unit_price * (self.quantity or 0)
-
     @property
     def packaging_info(self) -> str:
         if not self.product:
@@ -171,6 +211,22 @@ class Product(Base):
         return f"<Product {self.slug}: {self.name} - €{self.price}>"
 
 
+# Order totals are correlated subqueries loaded with the order row, so listing
+# or sorting orders by value needs no item rows in Python
+Order.total_amount = column_property(
+    select(func.coalesce(func.sum(OrderItem.subtotal), 0.0))
+    .where(OrderItem.order_id == Order.id)
+    .correlate_except(OrderItem)
+    .scalar_subquery()
+)
+Order.total_items = column_property(
+    select(func.coalesce(func.sum(OrderItem.quantity), 0))
+    .where(OrderItem.order_id == Order.id)
+    .correlate_except(OrderItem)
+    .scalar_subquery()
+)
+
+
 # Association table for many-to-many relationship between Batch and Product
 batch_products = Table(
     "batch_products",
@@ -202,6 +258,19 @@ class Batch(Base):
         "PickupSlot", back_populates="batch", cascade="all, delete-orphan"
     )
     products = relationship("Product", secondary=batch_products, backref="batches")
+    capacities = relationship(
+        "BatchCapacity", back_populates="batch", cascade="all, delete-orphan"
+    )
+
+    @property
+    def pickup_info(self) -> str:
+        """Human readable pickup text, slots or location."""
+        if self.pickup_text:
+            return self.pickup_text
+        if self.pickup_slots:
+            slots = sorted(self.pickup_slots, key=lambda s: s.sort_order)
+            return ", ".join([f"{s.date} {s.time}" for s in slots])
+        return self.pickup_location
 
     def __repr__(self):
         return f"<Batch {self.slug}: {self.name}>"
@@ -223,3 +292,69 @@ class PickupSlot(Base):
 
     def __repr__(self):
         return f"<PickupSlot {self.date} {self.time}>"
+
+
+class BatchCapacity(Base):
+    """How many units of a product a batch can sell, and how many are reserved.
+
+    Products without a row, or with a NULL capacity, are unlimited. Units are
+    reserved when an order is placed; an admin can raise the capacity to put
+    stock back on sale. Clearing a limit keeps the row, so the reserved count
+    still applies when a limit is set again.
+    """
+
+    __tablename__ = "batch_capacities"
+    __table_args__ = (CheckConstraint("reserved >= 0", name="ck_batch_capacities_reserved"),)
+
+    batch_id = Column(
+        Integer, ForeignKey("batches.id", ondelete="CASCADE"), primary_key=True
+    )
+    product_id = Column(
+        Integer, ForeignKey("products.id", ondelete="CASCADE"), primary_key=True
+    )
+    capacity = Column(Integer, nullable=True)
+    reserved = Column(Integer, nullable=False, default=0, server_default="0")
+
+    batch = relationship("Batch", back_populates="capacities")
+
+    @property
+    def remaining(self) -> Optional[int]:
+        if self.capacity is None:
+            return None
+        return max(self.capacity - self.reserved, 0)
+
+    def __repr__(self):
+        return f"<BatchCapacity batch={self.batch_id} product={self.product_id}: {self.reserved}/{self.capacity}>"
+
+
+class EmailStatus(str, enum.Enum):
+    """Delivery status of an outbox email"""
+
+    PENDING = "pending"
+    SENT = "sent"
+    FAILED = "failed"
+
+
+class EmailOutbox(Base):
+    """Email queued for background delivery (written with the order)"""
+
+    __tablename__ = "email_outbox"
+
+    id = Column(Integer, primary_key=True, index=True)
+    to_email = Column(String(255), nullable=False)
+    subject = Column(String(255), nullable=False)
+    html_body = Column(Text, nullable=False)
+    text_body = Column(Text, nullable=True)
+    status = Column(
+        String(20), default=EmailStatus.PENDING.value, nullable=False, index=True
+    )
+    attempts = Column(Integer, default=0, nullable=False)
+    next_attempt_at = Column(DateTime(timezone=True), nullable=False, index=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+    sent_at = Column(DateTime(timezone=True), nullable=True)
+
+    def __repr__(self):
+        return f"<EmailOutbox {self.id}: {self.subject} to {self.to_email} ({self.status})>"
@@ -1,32 +1,180 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from database import get_db
-from models import Order, OrderItem, OrderStatus, Product
+import re
+from typing import Dict, List, Literal, Optional, Tuple
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy import ColumnElement, insert, or_, select, tuple_
+from sqlalchemy.orm import Session, aliased, joinedload, selectinload
+from cache import availability_cache
+from database import AsyncDB, get_async_db
+from models import ORDER_PHONE_DIGITS, Batch, Order, OrderItem, OrderStatus, Product
 from schemas import OrderCreate, OrderResponse, OrderCreateResponse
 from email_service import email_service
+from email_outbox import dispatcher as outbox_dispatcher, queue_email
+from capacity import reserve_capacity
 import logging
-from models import Product
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/orders", tags=["orders"])
 
+# Named eager-loading profiles for order queries. Serializing an order touches
+# its items, their products and the batch, so load those up front instead of
+# lazily per row.
+ORDER_LOAD_PROFILES = {
+    "list": (
+        selectinload(Order.items).joinedload(OrderItem.product),
+        joinedload(Order.batch).selectinload(Batch.pickup_slots),
+    ),
+    "detail": (
+        joinedload(Order.items).joinedload(OrderItem.product),
+        joinedload(Order.batch).selectinload(Batch.pickup_slots),
+    ),
+}
 
-@router.post(
-    "/", response_model=OrderCreateResponse, status_code=status.HTTP_201_CREATED
-)
-async def create_order(order_data: OrderCreate, db: Session = Depends(get_db)):
+
+def query_orders(db: Session, profile: str = "list"):
+    """Return an Order query with the given eager-loading profile applied."""
+    return db.query(Order).options(*ORDER_LOAD_PROFILES[profile])
+
+
+# Shorter search terms cannot use the trigram indexes
+SEARCH_MIN_LENGTH = 3
+# Order ids are 32-bit integers
+MAX_ORDER_ID = 2**31 - 1
+
+
+def _contains_pattern(value: str) -> str:
+    """LIKE pattern matching ``value`` anywhere, with wildcards escaped."""
+    escaped = value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def order_search_condition(term: str) -> Optional[ColumnElement]:
     """
-    Create a new order from the webshop.
+    WHERE condition for a search term, or None when the term is too short.
 
-    This endpoint:
-    1. Validates the order data
-    2. Saves the order to the database
-    3. Sends confirmation email to customer (if email provided)
-    4. Sends notification email to admin
-    5. Returns the order ID and confirmation
+    Matches the order id ("123" or "#123") and, from SEARCH_MIN_LENGTH
+    characters, part of the customer name, email or phone number. Phone
+    numbers are compared without separators and leading zeros, so
+    "0494 12 34 56" also finds "+32494123456".
     """
+    term = term.strip()
+    conditions = []
+
+    order_id = term.removeprefix("#")
+    if order_id.isascii() and order_id.isdigit() and int(order_id) <= MAX_ORDER_ID:
+        conditions.append(Order.id == int(order_id))
+
+    if len(term) >= SEARCH_MIN_LENGTH:
+        pattern = _contains_pattern(term)
+        conditions.append(Order.customer_name.ilike(pattern, escape="\\"))
+        conditions.append(Order.customer_email.ilike(pattern, escape="\\"))
+
+        digits = re.sub(r"[ ./+-]", "", term).lstrip("0")
+        if digits.isascii() and digits.isdigit() and len(digits) >= SEARCH_MIN_LENGTH:
+            conditions.append(ORDER_PHONE_DIGITS.like(f"%{digits}%"))
+
+    return or_(*conditions) if conditions else None
+
+
+# Sort keys for order listings, all descending with id as tie-breaker
+ORDER_SORTS = {
+    "newest": "created_at",
+    "total": "total_amount",
+}
+
+
+def paginate_orders(
+    query,
+    limit: int,
+    after: Optional[int] = None,
+    before: Optional[int] = None,
+    sort: str = "newest",
+) -> Tuple[List[Order], Optional[int], Optional[int]]:
+    """
+    Keyset-paginate an Order query on (sort key, id), highest first.
+
+    ``sort`` is a key of ORDER_SORTS: newest first or highest total first.
+    Cursors are order IDs: ``after`` returns the page of orders following
+    that order, ``before`` the page of orders preceding it. Returns the
+    page plus the prev/next cursors (None when there is no such page).
+    A cursor order that no longer exists falls back to the first page.
+    """
+    column = getattr(Order, ORDER_SORTS[sort])
+    key = tuple_(column, Order.id)
+    cursor_id = after if after is not None else before
+
+    if cursor_id is not None and (
+        query.session.query(Order.id).filter(Order.id == cursor_id).first() is None
+    ):
+        # Deleted since the page was rendered: its key would compare as NULL
+        after = before = cursor_id = None
+
+    if cursor_id is not None:
+        cursor = aliased(Order)
+        cursor_value = (
+            select(getattr(cursor, ORDER_SORTS[sort]))
+            .where(cursor.id == cursor_id)
+            .scalar_subquery()
+        )
+        cursor_key = tuple_(cursor_value, cursor_id)
+
+    if before is not None:
+        rows = (
+            query.filter(key > cursor_key)
+            .order_by(column.asc(), Order.id.asc())
+            .limit(limit + 1)
+            .all()
+        )
+        has_more = len(rows) > limit
+        orders = list(reversed(rows[:limit]))
+        prev_cursor = orders[0].id if has_more and orders else None
+        next_cursor = orders[-1].id if orders else None
+        return orders, prev_cursor, next_cursor
+
+    if after is not None:
+        query = query.filter(key < cursor_key)
+
+    rows = (
+        query.order_by(column.desc(), Order.id.desc())
+        .limit(limit + 1)
+        .all()
+    )
+    has_more = len(rows) > limit
+    orders = rows[:limit]
+    prev_cursor = orders[0].id if after is not None and orders else None
+    next_cursor = orders[-1].id if has_more and orders else None
+    return orders, prev_cursor, next_cursor
+
+
+def _create_order(db: Session, order_data: OrderCreate) -> OrderCreateResponse:
+    """Save an order, its items and its queued emails in one transaction."""
     try:
+        # Resolve every product in a single IN query
+        slugs = {item.product_slug for item in order_data.items}
+        products = {
+            product.slug: product
+            for product in db.query(Product).filter(Product.slug.in_(slugs)).all()
+        }
+        missing = sorted(slugs - products.keys())
+        if missing:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Product(en) niet gevonden: {', '.join(missing)}",
+            )
+
+        # Take stock for every line before writing anything; raises a 409
+        # when the batch is sold out for one of the products
+        quantities: Dict[int, int] = {}
+        for item_data in order_data.items:
+            product_id = products[item_data.product_slug].id
+            quantities[product_id] = quantities.get(product_id, 0) + item_data.quantity
+        reserve_capacity(
+            db,
+            order_data.batch_id,
+            quantities,
+            {product.id: product.name for product in products.values()},
+        )
+
         # Create order record
         order = Order(
             customer_name=order_data.customer_name,
@@ -40,87 +188,86 @@ async def create_order(order_data: OrderCreate, db: Session = Depends(get_db)):
         db.add(order)
         db.flush()  # get order ID
 
-        # Create order items (totals calculated automatically via properties)
-        for item_data in order_data.items:
-            product = (
-                db.query(Product).filter(Product.slug == item_data.product_slug).first()
-            )
-            if not product:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=f"Product '{item_data.product_slug}' niet gevonden",
-                )
-
-            order_item = OrderItem(
-                order_id=order.id,
-                product_id=product.id,
-                quantity=item_data.quantity,
-            )
-            db.add(order_item)
-
-        db.commit()
-        db.refresh(order)
+        # Snapshot prices now, so later price edits do not change this order
+        lines = [
+            {
+                "order_id": order.id,
+                "product_id": products[item_data.product_slug].id,
+                "quantity": item_data.quantity,
+                "unit_price": float(products[item_data.product_slug].price),
+                "subtotal": float(products[item_data.product_slug].price)
+                * item_data.quantity,
+            }
+            for item_data in order_data.items
+        ]
 
-        logger.info(f"Order #{order.id} created successfully for {order.customer_name}")
+        # Insert all order items in one executemany
+        db.execute(insert(OrderItem), lines)
 
-        # Prepare items for email
+        # Build the email payload from in-memory data before commit expires it
+        order_id = order.id
+        customer_name = order.customer_name
+        customer_email = order.customer_email
+        batch_name = order.batch_name
+        pickup_info = order.pickup_info or "Wordt later bevestigd"
         email_items = [
             {
-                "name": item.product_name,
-                "quantity": item.quantity,
-                "subtotal": item.computed_subtotal,
+                "name": products[item_data.product_slug].name,
+                "quantity": line["quantity"],
+                "subtotal": line["subtotal"],
             }
-            for item in order.items
+            for item_data, line in zip(order_data.items, lines)
         ]
+        total = sum(item["subtotal"] for item in email_items)
 
-        # Send emails asynchronously
+        # Queue emails in the same transaction as the order
         email_sent = False
+        if customer_email:
+            queue_email(
+                db,
+                customer_email,
+                *email_service.render_order_confirmation_to_customer(
+                    customer_name=customer_name,
+                    order_id=order_id,
+                    batch_name=batch_name,
+                    pickup_info=pickup_info,
+                    items=email_items,
+                    total=total,
+                ),
+            )
+            email_sent = email_service.enabled
 
-        # Send confirmation to customer if email provided
-        if order.customer_email:
-            try:
-                customer_email_sent = (
-                    await email_service.send_order_confirmation_to_customer(
-                        customer_email=order.customer_email,
-                        customer_name=order.customer_name,
-                        order_id=order.id,
-                        batch_name=order.batch_name,
-                        pickup_info=order.pickup_info or "Wordt later bevestigd",
-                        items=email_items,
-                        total=order.total_amount,
-                    )
-                )
-                email_sent = customer_email_sent
-                logger.info(f"Customer confirmation email sent for order #{order.id}")
-            except Exception as e:
-                logger.error(
-                    f"Failed to send customer email for order #{order.id}: {str(e)}"
-                )
-
-        # Send notification to admin
-        try:
-            await email_service.send_order_notification_to_admin(
-                order_id=order.id,
-                customer_name=order.customer_name,
-                customer_phone=order.customer_phone or "Niet opgegeven",
-                customer_email=order.customer_email or "Niet opgegeven",
-                batch_name=order.batch_name,
-                pickup_info=order.pickup_info or "Wordt later bevestigd",
-                items=email_items,
-                total=order.total_amount,
-                notes=order.notes,
+        if email_service.admin_email:
+            queue_email(
+                db,
+                email_service.admin_email,
+                *email_service.render_order_notification_to_admin(
+                    order_id=order_id,
+                    customer_name=customer_name,
+                    customer_phone=order_data.customer_phone or "Niet opgegeven",
+                    customer_email=customer_email or "Niet opgegeven",
+                    batch_name=batch_name,
+                    pickup_info=pickup_info,
+                    items=email_items,
+                    total=total,
+                    notes=order_data.notes,
+                ),
             )
-            logger.info(f"Admin notification email sent for order #{order.id}")
-        except Exception as e:
-            logger.error(f"Failed to send admin email for order #{order.id}: {str(e)}")
+
+        db.commit()
+
+        logger.info(f"Order #{order_id} created successfully for {customer_name}")
 
         return OrderCreateResponse(
             success=True,
-            order_id=order.id,
-            message=f"Bestelling #{order.id} succesvol aangemaakt",
+            order_id=order_id,
+            message=f"Bestelling #{order_id} succesvol aangemaakt",
             email_sent=email_sent,
         )
 
+    except HTTPException:
+        db.rollback()
+        raise
     except Exception as e:
         db.rollback()
         logger.error(f"Failed to create order: {str(e)}", exc_info=True)
@@ -130,49 +277,104 @@ async def create_order(order_data: OrderCreate, db: Session = Depends(get_db)):
         )
 
 
+@router.post(
+    "/", response_model=OrderCreateResponse, status_code=status.HTTP_201_CREATED
+)
+async def create_order(order_data: OrderCreate, db: AsyncDB = Depends(get_async_db)):
+    """
+    Create a new order from the webshop.
+
+    This endpoint:
+    1. Validates the order data
+    2. Saves the order to the database
+    3. Queues confirmation email to customer (if email provided)
+    4. Queues notification email to admin
+    5. Returns the order ID and confirmation
+
+    Emails are written to the outbox in the same transaction as the order and
+    sent by the background dispatcher, so SMTP latency never blocks checkout.
+    """
+    response = await db.run(_create_order, order_data)
+    outbox_dispatcher.wake()
+    availability_cache.invalidate(order_data.batch_id)
+    return response
+
+
 @router.get("/{order_id}", response_model=OrderResponse)
-def get_order(order_id: int, db: Session = Depends(get_db)):
+async def get_order(order_id: int, db: AsyncDB = Depends(get_async_db)):
     """
     Get a specific order by ID.
 
     Returns the full order details including all items.
     """
-    order = db.query(Order).filter(Order.id == order_id).first()
 
-    if not order:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Bestelling #{order_id} niet gevonden",
-        )
+    def load(db: Session) -> OrderResponse:
+        order = query_orders(db, "detail").filter(Order.id == order_id).first()
 
-    return order
+        if not order:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Bestelling #{order_id} niet gevonden",
+            )
+
+        return OrderResponse.model_validate(order)
+
+    return await db.run(load)
 
 
 @router.get("/", response_model=list[OrderResponse])
-def list_orders(
-    skip: int = 0,
-    limit: int = 100,
+async def list_orders(
+    request: Request,
+    response: Response,
+    limit: int = Query(100, ge=1, le=500),
+    after: Optional[int] = None,
+    before: Optional[int] = None,
     batch_id: str = None,
     status_filter: OrderStatus = None,
-    db: Session = Depends(get_db),
+    sort: Literal["newest", "total"] = "newest",
+    db: AsyncDB = Depends(get_async_db),
 ):
     """
-    List all orders with optional filtering.
+    List all orders with optional filtering, newest or highest total first.
 
     Parameters:
-    - skip: Number of orders to skip (for pagination)
     - limit: Maximum number of orders to return
+    - after: Order ID cursor; return the (older) orders after this one
+    - before: Order ID cursor; return the (newer) orders before this one
     - batch_id: Filter by batch ID
     - status_filter: Filter by order status
+    - sort: "newest" (default) or "total" (highest order value first)
+
+    Links to the previous/next page are returned in the ``Link`` header.
     """
-    query = db.query(Order)
 
-    if batch_id:
-        query = query.filter(Order.batch_id == batch_id)
+    def load(db: Session):
+        query = query_orders(db, "list")
+
+        if batch_id:
+            query = query.filter(Order.batch_id == batch_id)
+
+        if status_filter:
+            query = query.filter(Order.status == status_filter)
+
+        orders, prev_cursor, next_cursor = paginate_orders(
+            query, limit, after, before, sort
+        )
+        return (
+            [OrderResponse.model_validate(order) for order in orders],
+            prev_cursor,
+            next_cursor,
+        )
 
-    if status_filter:
-        query = query.filter(Order.status == status_filter)
+    orders, prev_cursor, next_cursor = await db.run(load)
 
-    orders = query.order_by(Order.created_at.desc()).offset(skip).limit(limit).all()
+    links = []
+    page_url = request.url.remove_query_params(["after", "before"])
+    if prev_cursor is not None:
+        links.append(f'<{page_url.include_query_params(before=prev_cursor)}>; rel="prev"')
+    if next_cursor is not None:
+        links.append(f'<{page_url.include_query_params(after=next_cursor)}>; rel="next"')
+    if links:
+        response.headers["Link"] = ", ".join(links)
 
     return orders
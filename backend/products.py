@@ -1,103 +1,149 @@
-from fastapi import APIRouter, Depends, HTTPException, Response, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from pydantic import TypeAdapter
 from sqlalchemy.orm import Session
 
 from admin import require_admin
-from database import get_db
+from cache import cached_json_response, catalog_cache, invalidate_product_documents
+from database import AsyncDB, get_async_db
 from models import Product
 from schemas import ProductCreate, ProductResponse, ProductUpdate
 
 router = APIRouter(prefix="/api/products", tags=["products"])
 
+product_list_adapter = TypeAdapter(list[ProductResponse])
+
+
+def _build_catalog(db: Session) -> bytes:
+    """Serialize the full product catalog."""
+    products = db.query(Product).order_by(Product.name.asc()).all()
+    return product_list_adapter.dump_json(
+        product_list_adapter.validate_python(products, from_attributes=True)
+    )
+
 
 @router.get("/", response_model=list[ProductResponse])
-def list_products(db: Session = Depends(get_db)) -> list[Product]:
-    """Return the full product catalog."""
-    return db.query(Product).order_by(Product.name.asc()).all()
+async def list_products(
+    request: Request, db: AsyncDB = Depends(get_async_db)
+) -> Response:
+    """
+    Return the full product catalog.
+
+    The serialized catalog is cached in memory until a product is written, and
+    conditional requests (If-None-Match / If-Modified-Since) get a 304.
+    """
+    document = catalog_cache.peek("all")
+    if document is None:
+        document = await db.run(
+            lambda session: catalog_cache.get("all", lambda: _build_catalog(session))
+        )
+    return cached_json_response(request, document)
 
 
 @router.get("/{slug}", response_model=ProductResponse)
-def get_product(slug: str, db: Session = Depends(get_db)) -> Product:
+async def get_product(
+    slug: str, db: AsyncDB = Depends(get_async_db)
+) -> ProductResponse:
     """Fetch a single product by slug."""
-    product = db.query(Product).filter(Product.slug == slug).first()
-    if not product:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="Product niet gevonden"
-        )
-    return product
+
+    def load(db: Session) -> ProductResponse:
+        product = db.query(Product).filter(Product.slug == slug).first()
+        if not product:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Product niet gevonden"
+            )
+        return ProductResponse.model_validate(product)
+
+    return await db.run(load)
 
 
 @router.post("/", response_model=ProductResponse, status_code=status.HTTP_201_CREATED)
-def create_product(
+async def create_product(
     product_in: ProductCreate,
-    db: Session = Depends(get_db),
+    db: AsyncDB = Depends(get_async_db),
     _: str = Depends(require_admin),
-) -> Product:
+) -> ProductResponse:
     """Create a new product (admin only)."""
-    existing = db.query(Product).filter(Product.slug == product_in.slug).first()
-    if existing:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Product met deze slug bestaat al",
-        )
 
-    product = Product(**product_in.model_dump())
-    db.add(product)
-    db.commit()
-    db.refresh(product)
-    return product
+    def create(db: Session) -> ProductResponse:
+        existing = db.query(Product).filter(Product.slug == product_in.slug).first()
+        if existing:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Product met deze slug bestaat al",
+            )
+
+        product = Product(**product_in.model_dump())
+        db.add(product)
+        db.commit()
+        catalog_cache.invalidate()
+        db.refresh(product)
+        return ProductResponse.model_validate(product)
+
+    return await db.run(create)
 
 
 @router.put("/{product_id}", response_model=ProductResponse)
-def update_product(
+async def update_product(
     product_id: int,
     product_in: ProductUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncDB = Depends(get_async_db),
     _: str = Depends(require_admin),
-) -> Product:
+) -> ProductResponse:
     """Update a product (admin only)."""
-    product = db.query(Product).filter(Product.id == product_id).first()
-    if not product:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="Product niet gevonden"
-        )
 
-    update_data = product_in.model_dump(exclude_unset=True)
-
-    if "slug" in update_data:
-        slug = update_data["slug"]
-        if (
-            slug
-            and slug != product.slug
-            and db.query(Product).filter(Product.slug == slug).first()
-        ):
+    def update(db: Session) -> ProductResponse:
+        product = db.query(Product).filter(Product.id == product_id).first()
+        if not product:
             raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Product met deze slug bestaat al",
+                status_code=status.HTTP_404_NOT_FOUND, detail="Product niet gevonden"
             )
 
-    for field, value in update_data.items():
-        setattr(product, field, value)
+        update_data = product_in.model_dump(exclude_unset=True)
 
-    db.add(product)
-    db.commit()
-    db.refresh(product)
-    return product
+        if "slug" in update_data:
+            slug = update_data["slug"]
+            if (
+                slug
+                and slug != product.slug
+                and db.query(Product).filter(Product.slug == slug).first()
+            ):
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Product met deze slug bestaat al",
+                )
+
+        for field, value in update_data.items():
+            setattr(product, field, value)
+
+        affected_batches = [batch.slug for batch in product.batches]
+        db.add(product)
+        db.commit()
+        invalidate_product_documents(affected_batches)
+        db.refresh(product)
+        return ProductResponse.model_validate(product)
+
+    return await db.run(update)
 
 
 @router.delete("/{product_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_product(
+async def delete_product(
     product_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncDB = Depends(get_async_db),
     _: str = Depends(require_admin),
 ) -> Response:
     """Delete a product (admin only)."""
-    product = db.query(Product).filter(Product.id == product_id).first()
-    if not product:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="Product niet gevonden"
-        )
 
-    db.delete(product)
-    db.commit()
+    def delete(db: Session) -> None:
+        product = db.query(Product).filter(Product.id == product_id).first()
+        if not product:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Product niet gevonden"
+            )
+
+        affected_batches = [batch.slug for batch in product.batches]
+        db.delete(product)
+        db.commit()
+        invalidate_product_documents(affected_batches)
 
+    await db.run(delete)
     return Response(status_code=status.HTTP_204_NO_CONTENT)
@@ -0,0 +1,230 @@
+"""Admin reports computed with grouped SQL queries.
+
+Reports aggregate in the database and only bring the grouped rows into
+Python, so they stay fast however many orders a batch has.
+"""
+
+import csv
+import io
+import tempfile
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Sequence
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from models import ACTIVE_ORDER_STATUSES, Batch, Order, OrderItem, OrderStatus, Product
+from schemas import BatchPickListResponse, PickListLine
+
+# Semicolons and a byte order mark make Excel (Dutch locale) open CSV files
+# in columns and with the right encoding
+CSV_DELIMITER = ";"
+CSV_BOM = "\ufeff"
+
+# Rows fetched per round trip by exports (server-side cursor on PostgreSQL)
+EXPORT_CHUNK_SIZE = 1000
+XLSX_CHUNK_SIZE = 64 * 1024
+
+
+def _csv_value(value: Any) -> Any:
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        # Decimal comma, to match the semicolon delimiter
+        return f"{value:.2f}".replace(".", ",")
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d %H:%M")
+    return value
+
+
+def stream_csv(header: Sequence[str], rows: Iterable[Sequence]) -> Iterator[str]:
+    """Encode rows as CSV, one line at a time, for a StreamingResponse."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=CSV_DELIMITER)
+
+    def line(row: Sequence) -> str:
+        writer.writerow([_csv_value(value) for value in row])
+        value = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return value
+
+    yield CSV_BOM + line(header)
+    for row in rows:
+        yield line(row)
+
+
+def _xlsx_value(value: Any) -> Any:
+    if isinstance(value, datetime) and value.tzinfo is not None:
+        # Excel has no time zones
+        return value.replace(tzinfo=None)
+    return value
+
+
+def stream_xlsx(
+    header: Sequence[str], rows: Iterable[Sequence], title: str
+) -> Iterator[bytes]:
+    """Write rows to an XLSX workbook and stream the file.
+
+    The workbook is written in openpyxl's write-only mode, which keeps rows
+    in a temporary file instead of memory. An XLSX file can only be sent once
+    it is complete, so the first bytes go out after the last row is read.
+    """
+    # Only needed for exports, so not imported at startup
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title)
+    sheet.append(list(header))
+    for row in rows:
+        sheet.append([_xlsx_value(value) for value in row])
+
+    with tempfile.TemporaryFile() as file:
+        workbook.save(file)
+        file.seek(0)
+        while chunk := file.read(XLSX_CHUNK_SIZE):
+            yield chunk
+
+
+ORDER_EXPORT_HEADER = (
+    "bestelling",
+    "datum",
+    "status",
+    "klant",
+    "e-mail",
+    "telefoon",
+    "batch",
+    "opmerkingen",
+    "product",
+    "aantal",
+    "eenheidsprijs",
+    "subtotaal",
+)
+
+
+def export_order_rows(conditions: List[Any]) -> Iterator[Sequence]:
+    """One row per order item (or per order without items), oldest first.
+
+    Uses its own session, since the rows are read while the response is
+    streamed. Plain column rows are fetched EXPORT_CHUNK_SIZE at a time, so
+    no ORM objects pile up in the session.
+    """
+    db = SessionLocal()
+    try:
+        result = db.execute(
+            select(
+                Order.id,
+                Order.created_at,
+                Order.status,
+                Order.customer_name,
+                Order.customer_email,
+                Order.customer_phone,
+                Order.batch_id,
+                Order.notes,
+                Product.name,
+                OrderItem.quantity,
+                OrderItem.unit_price,
+                OrderItem.subtotal,
+            )
+            .select_from(Order)
+            .outerjoin(OrderItem, OrderItem.order_id == Order.id)
+            .outerjoin(Product, Product.id == OrderItem.product_id)
+            .where(*conditions)
+            .order_by(Order.created_at, Order.id, OrderItem.id)
+            .execution_options(yield_per=EXPORT_CHUNK_SIZE)
+        )
+        for row in result:
+            yield (row[0], row[1], row[2].value, *row[3:])
+    finally:
+        db.close()
+
+
+def batch_pick_list(db: Session, batch: Batch) -> BatchPickListResponse:
+    """Units ordered per product and status, with estimated pieces and grams.
+
+    Pieces and grams are estimated for the units still to be picked up, from
+    the product's pieces per package and grams per piece.
+    """
+    rows = db.execute(
+        select(
+            Product.id,
+            Product.slug,
+            Product.name,
+            Product.packaging_pieces,
+            Product.unit_grams,
+            Order.status,
+            func.sum(OrderItem.quantity),
+        )
+        .select_from(OrderItem)
+        .join(Order, Order.id == OrderItem.order_id)
+        .join(Product, Product.id == OrderItem.product_id)
+        .where(Order.batch_id == batch.slug)
+        .group_by(Product.id, Order.status)
+        .order_by(Product.name, Product.id)
+    ).all()
+
+    orders: Dict[str, int] = dict(
+        db.query(Order.status, func.count(Order.id))
+        .filter(Order.batch_id == batch.slug)
+        .group_by(Order.status)
+        .all()
+    )
+
+    lines: Dict[int, PickListLine] = {}
+    for product_id, slug, name, pieces, grams, order_status, quantity in rows:
+        line = lines.get(product_id)
+        if line is None:
+            line = lines[product_id] = PickListLine(
+                product_id=product_id,
+                product_slug=slug,
+                product_name=name,
+                packaging_pieces=pieces,
+                unit_grams=grams,
+                quantities={s.value: 0 for s in OrderStatus},
+            )
+        line.quantities[order_status.value] += quantity
+        line.ordered += quantity
+        if order_status in ACTIVE_ORDER_STATUSES:
+            line.to_pick += quantity
+
+    for line in lines.values():
+        pieces_per_unit = line.packaging_pieces or 1
+        if line.packaging_pieces:
+            line.pieces = line.to_pick * line.packaging_pieces
+        if line.unit_grams:
+            line.grams = line.to_pick * pieces_per_unit * line.unit_grams
+
+    return BatchPickListResponse(
+        batch_slug=batch.slug,
+        batch_name=batch.name,
+        statuses=[s.value for s in OrderStatus],
+        orders={s.value: orders.get(s, 0) for s in OrderStatus},
+        lines=list(lines.values()),
+        to_pick=sum(line.to_pick for line in lines.values()),
+        grams=sum(line.grams or 0 for line in lines.values()),
+    )
+
+
+PICK_LIST_CSV_HEADER = (
+    "product",
+    "slug",
+    *(s.value for s in OrderStatus),
+    "besteld",
+    "te leveren",
+    "stuks",
+    "gram",
+)
+
+
+def pick_list_csv_rows(report: BatchPickListResponse) -> Iterator[Sequence]:
+    for line in report.lines:
+        yield (
+            line.product_name,
+            line.product_slug,
+            *(line.quantities[s] for s in report.statuses),
+            line.ordered,
+            line.to_pick,
+            line.pieces,
+            line.grams,
+        )
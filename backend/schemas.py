@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr, Field
-from typing import Optional, List
+from typing import Dict, List, Optional
 from datetime import datetime
 from models import OrderStatus
 
@@ -185,3 +185,45 @@ class BatchListResponse(BaseModel):
 
     class Config:
         from_attributes = True
+
+
+class ProductAvailability(BaseModel):
+    """Remaining stock of one product in a batch"""
+
+    slug: str
+    remaining: Optional[int] = Field(None, description="Null when not limited")
+    sold_out: bool
+
+
+class BatchAvailabilityResponse(BaseModel):
+    """Remaining stock per product of a batch"""
+
+    batch: str
+    products: List[ProductAvailability]
+
+
+class PickListLine(BaseModel):
+    """Units of one product ordered in a batch"""
+
+    product_id: int
+    product_slug: str
+    product_name: str
+    packaging_pieces: Optional[int]
+    unit_grams: Optional[int]
+    quantities: Dict[str, int] = Field(..., description="Units per order status")
+    ordered: int = 0
+    to_pick: int = Field(0, description="Units in orders not yet picked up")
+    pieces: Optional[int] = Field(None, description="Estimated pieces to pick")
+    grams: Optional[int] = Field(None, description="Estimated grams to pick")
+
+
+class BatchPickListResponse(BaseModel):
+    """Pick list of a batch: what to prepare for pickup day"""
+
+    batch_slug: str
+    batch_name: str
+    statuses: List[str]
+    orders: Dict[str, int] = Field(..., description="Orders per status")
+    lines: List[PickListLine]
+    to_pick: int
+    grams: int
@@ -0,0 +1,25 @@
+"""Shared Jinja environment for admin pages and email templates.
+
+Templates never change while the process runs, so the per-render mtime check
+is skipped and compiled bytecode is kept on disk to speed up cold starts.
+HTML templates are autoescaped; plain-text email bodies are not.
+"""
+
+import os
+import tempfile
+
+from fastapi.templating import Jinja2Templates
+from jinja2 import FileSystemBytecodeCache, select_autoescape
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(__file__), "templates")
+TEMPLATE_CACHE_DIR = os.getenv(
+    "TEMPLATE_CACHE_DIR", os.path.join(tempfile.gettempdir(), "akkervarken-templates")
+)
+os.makedirs(TEMPLATE_CACHE_DIR, exist_ok=True)
+
+templates = Jinja2Templates(
+    directory=TEMPLATE_DIR,
+    autoescape=select_autoescape(["html"]),
+    auto_reload=False,
+    bytecode_cache=FileSystemBytecodeCache(TEMPLATE_CACHE_DIR),
+)
@@ -0,0 +1,217 @@
+"""Shared fixtures for the backend tests.
+
+The tests run against a throwaway SQLite database by default. Point
+TEST_DATABASE_URL at an empty PostgreSQL database to also run the checks
+marked ``postgres`` (row locks, query plans, trigram search):
+
+    TEST_DATABASE_URL=postgresql://localhost/akkervarken_test pytest
+
+The schema is created once per run and every table is emptied between tests.
+"""
+
+import os
+import tempfile
+
+# database.py and email_service.py read their settings at import time
+_TEST_DIR = tempfile.mkdtemp(prefix="akkervarken-tests-")
+os.environ["DATABASE_URL"] = os.getenv(
+    "TEST_DATABASE_URL", f"sqlite:///{os.path.join(_TEST_DIR, 'test.db')}"
+)
+os.environ["DATABASE_ASYNC"] = "false"
+os.environ["MIGRATE_ON_STARTUP"] = "false"
+os.environ["ADMIN_EMAIL"] = "admin@akkervarken.be"
+os.environ["ADMIN_PASSWORD"] = "test"
+for _name in ("SMTP_HOST", "SMTP_USER", "SMTP_PASSWORD"):
+    os.environ.pop(_name, None)
+
+from typing import Dict, Iterable, Optional  # noqa: E402
+
+import pytest  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import text  # noqa: E402
+from sqlalchemy.pool import NullPool  # noqa: E402
+
+import database  # noqa: E402
+from cache import caches  # noqa: E402
+from main import app  # noqa: E402
+from models import (  # noqa: E402
+    Batch,
+    BatchCapacity,
+    Order,
+    OrderItem,
+    OrderStatus,
+    PickupSlot,
+    Product,
+)
+
+ADMIN_AUTH = (os.environ["ADMIN_EMAIL"], os.environ["ADMIN_PASSWORD"])
+
+IS_POSTGRES = database.engine.dialect.name == "postgresql"
+
+requires_postgres = pytest.mark.skipif(
+    not IS_POSTGRES, reason="needs TEST_DATABASE_URL pointing at PostgreSQL"
+)
+
+
+def pytest_collection_modifyitems(items):
+    for item in items:
+        if item.get_closest_marker("postgres"):
+            item.add_marker(requires_postgres)
+
+
+@pytest.fixture(scope="session", autouse=True)
+def schema():
+    """Create all tables once for the whole run."""
+    if IS_POSTGRES:
+        with database.engine.begin() as conn:
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+    database.Base.metadata.drop_all(database.engine)
+    database.Base.metadata.create_all(database.engine)
+    yield
+    database.engine.dispose()
+
+
+@pytest.fixture(autouse=True)
+def clean_database(schema):
+    """Empty every table and the document caches after each test."""
+    yield
+    with database.engine.begin() as conn:
+        for table in reversed(database.Base.metadata.sorted_tables):
+            conn.execute(table.delete())
+    for cache in caches.values():
+        cache.drop()
+
+
+@pytest.fixture(params=["threadpool", "async"])
+def database_mode(request, monkeypatch):
+    """Run a test with DATABASE_ASYNC off and on.
+
+    With "async", the async routes use an aiosqlite/asyncpg engine on the test
+    database. TestClient runs every request on a new event loop, so the
+    engine keeps no pooled connections between requests.
+    """
+    if request.param == "async":
+        from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+        scheme, rest = database.DATABASE_URL.split("://", 1)
+        async_engine = create_async_engine(
+            f"{database.ASYNC_DRIVERS[scheme.split('+')[0]]}://{rest}", poolclass=NullPool
+        )
+        monkeypatch.setattr(
+            database,
+            "AsyncSessionLocal",
+            async_sessionmaker(
+                async_engine, autocommit=False, autoflush=False, expire_on_commit=False
+            ),
+        )
+    return request.param
+
+
+@pytest.fixture
+def db():
+    session = database.SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def client():
+    """Client for the public API (startup tasks are not run)."""
+    return TestClient(app)
+
+
+@pytest.fixture
+def admin_client():
+    admin = TestClient(app)
+    admin.auth = ADMIN_AUTH
+    return admin
+
+
+@pytest.fixture
+def make_batch(db):
+    """Create an active batch offering new products named after ``prices``.
+
+    ``capacities`` limits the stock of some of those products by slug.
+    """
+
+    def make(
+        slug: str = "najaar",
+        prices: Optional[Dict[str, float]] = None,
+        capacities: Optional[Dict[str, int]] = None,
+    ) -> Batch:
+        prices = prices or {"gehakt": 12.5, "spek": 8.0, "worst": 10.0}
+        products = [
+            Product(
+                slug=product_slug,
+                name=product_slug.capitalize(),
+                description=f"{product_slug} van het akkervarken",
+                price=price,
+                weight_display="500g",
+            )
+            for product_slug, price in prices.items()
+        ]
+        batch = Batch(slug=slug, name=slug.capitalize(), pickup_location="Boerderij")
+        batch.products = products
+        batch.pickup_slots = [PickupSlot(date="2025-12-13", time="10:00 - 12:00")]
+        db.add(batch)
+        db.flush()
+        by_slug = {product.slug: product for product in products}
+        for product_slug, capacity in (capacities or {}).items():
+            batch.capacities.append(
+                BatchCapacity(product_id=by_slug[product_slug].id, capacity=capacity)
+            )
+        db.commit()
+        return batch
+
+    return make
+
+
+@pytest.fixture
+def make_order(db):
+    """Insert an order for ``items`` (product, quantity) pairs directly."""
+
+    def make(
+        batch: Batch,
+        items: Iterable = (),
+        status: OrderStatus = OrderStatus.PENDING,
+        **fields,
+    ) -> Order:
+        fields.setdefault("customer_name", "Jan Janssens")
+        order = Order(batch_id=batch.slug, status=status, **fields)
+        order.items = [
+            OrderItem(
+                product_id=product.id,
+                quantity=quantity,
+                unit_price=product.price,
+                subtotal=product.price * quantity,
+            )
+            for product, quantity in items
+        ]
+        db.add(order)
+        db.commit()
+        return order
+
+    return make
+
+
+@pytest.fixture
+def place_order(client):
+    """POST an order for ``items`` (product slug -> quantity) to the API."""
+
+    def place(batch_slug: str, items: Dict[str, int], **fields):
+        payload = {
+            "customer_name": "Jan Janssens",
+            "customer_email": "jan@example.com",
+            "batch_id": batch_slug,
+            "batch_name": batch_slug.capitalize(),
+            "items": [
+                {"product_slug": slug, "quantity": quantity}
+                for slug, quantity in items.items()
+            ],
+        }
+        payload.update(fields)
+        return client.post("/api/orders/", json=payload)
+
+    return place
@@ -0,0 +1,271 @@
+import re
+from datetime import datetime
+
+import pytest
+
+from email_service import email_service
+from models import EmailOutbox, Order, OrderStatus
+
+
+def _statuses(db):
+    db.expire_all()
+    return {order.id: order.status for order in db.query(Order)}
+
+
+def test_bulk_status_updates_the_selected_orders(db, admin_client, make_batch, make_order):
+    batch = make_batch()
+    first, second, third = (make_order(batch) for _ in range(3))
+
+    response = admin_client.post(
+        "/admin/orders/bulk-status",
+        data={
+            "new_status": OrderStatus.CONFIRMED.value,
+            "scope": "selected",
+            "order_ids": [str(first.id), str(third.id)],
+        },
+        follow_redirects=False,
+    )
+
+    assert response.status_code == 303
+    assert "bulk_updated=2" in response.headers["location"]
+    assert _statuses(db) == {
+        first.id: OrderStatus.CONFIRMED,
+        second.id: OrderStatus.PENDING,
+        third.id: OrderStatus.CONFIRMED,
+    }
+
+
+@pytest.mark.parametrize("order_id", ["x", "", "1.5", "-1", "²", "99999999999"])
+def test_bulk_status_rejects_invalid_order_ids(
+    db, admin_client, make_batch, make_order, order_id
+):
+    order = make_order(make_batch())
+
+    response = admin_client.post(
+        "/admin/orders/bulk-status",
+        data={
+            "new_status": OrderStatus.CONFIRMED.value,
+            "scope": "selected",
+            "order_ids": [str(order.id), order_id],
+        },
+    )
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Ongeldige bestelling geselecteerd"
+    assert _statuses(db) == {order.id: OrderStatus.PENDING}
+
+
+def _bulk_update(admin_client, **form):
+    return admin_client.post(
+        "/admin/orders/bulk-status", data=form, follow_redirects=False
+    )
+
+
+@pytest.mark.usefixtures("database_mode")
+def test_bulk_status_updates_every_order_in_the_filter(
+    db, admin_client, make_batch, make_order
+):
+    najaar = make_batch()
+    winter = make_batch("winter", prices={"ribbetjes": 14.0})
+    pending = make_order(najaar)
+    confirmed = make_order(najaar, status=OrderStatus.CONFIRMED)
+    other_batch = make_order(winter)
+
+    response = _bulk_update(
+        admin_client,
+        new_status=OrderStatus.READY_FOR_PICKUP.value,
+        scope="filter",
+        batch_id="najaar",
+        status_filter=OrderStatus.PENDING.value,
+    )
+
+    assert response.status_code == 303
+    assert "bulk_updated=1" in response.headers["location"]
+    assert _statuses(db) == {
+        pending.id: OrderStatus.READY_FOR_PICKUP,
+        confirmed.id: OrderStatus.CONFIRMED,
+        other_batch.id: OrderStatus.PENDING,
+    }
+
+
+def _bulk_filter_form(admin_client, filters):
+    """The filter fields the bulk form on the order list would submit."""
+    page = admin_client.get(f"/admin/orders?{filters}").text
+    assert "Alle bestellingen in deze filter" in page
+    return dict(re.findall(r'<input type="hidden" name="(\w+)" value="([^"]*)">', page))
+
+
+@pytest.mark.usefixtures("database_mode")
+def test_bulk_status_filter_scope_only_updates_the_search_results(
+    db, admin_client, make_batch, make_order
+):
+    batch = make_batch()
+    peeters = make_order(batch, customer_name="Mie Peeters")
+    janssens = make_order(batch, customer_name="Jan Janssens")
+
+    form = _bulk_filter_form(admin_client, "batch_id=najaar&q=peeters")
+    response = _bulk_update(
+        admin_client,
+        new_status=OrderStatus.READY_FOR_PICKUP.value,
+        scope="filter",
+        **form,
+    )
+
+    assert form["q"] == "peeters"
+    assert "bulk_updated=1" in response.headers["location"]
+    assert _statuses(db) == {
+        peeters.id: OrderStatus.READY_FOR_PICKUP,
+        janssens.id: OrderStatus.PENDING,
+    }
+
+
+@pytest.mark.usefixtures("database_mode")
+def test_bulk_status_filter_scope_only_updates_the_listed_days(
+    db, admin_client, make_batch, make_order
+):
+    batch = make_batch()
+    before = make_order(batch, created_at=datetime(2026, 1, 9, 23, 30))
+    first_day = make_order(batch, created_at=datetime(2026, 1, 10, 0, 0))
+    last_day = make_order(batch, created_at=datetime(2026, 1, 11, 23, 30))
+    after = make_order(batch, created_at=datetime(2026, 1, 12, 0, 0))
+
+    form = _bulk_filter_form(
+        admin_client, "batch_id=najaar&date_from=2026-01-10&date_to=2026-01-11"
+    )
+    response = _bulk_update(
+        admin_client,
+        new_status=OrderStatus.CONFIRMED.value,
+        scope="filter",
+        **form,
+    )
+
+    assert (form["date_from"], form["date_to"]) == ("2026-01-10", "2026-01-11")
+    assert "bulk_updated=2" in response.headers["location"]
+    assert _statuses(db) == {
+        before.id: OrderStatus.PENDING,
+        first_day.id: OrderStatus.CONFIRMED,
+        last_day.id: OrderStatus.CONFIRMED,
+        after.id: OrderStatus.PENDING,
+    }
+
+
+def test_bulk_filter_scope_is_only_offered_for_an_applied_filter(
+    admin_client, make_batch, make_order
+):
+    make_order(make_batch())
+
+    for filters in ("", "q=ja", "status_filter=onbekend"):
+        page = admin_client.get(f"/admin/orders?{filters}").text
+        assert "Alle bestellingen in deze filter" not in page, filters
+
+
+@pytest.mark.parametrize(
+    "form, detail",
+    [
+        ({}, "Kies een filter om alle bestellingen bij te werken"),
+        ({"batch_id": "najaar", "status_filter": "onbekend"}, "Ongeldige status"),
+    ],
+)
+def test_bulk_status_filter_scope_needs_a_valid_filter(
+    db, admin_client, make_batch, make_order, form, detail
+):
+    order = make_order(make_batch())
+
+    response = _bulk_update(
+        admin_client, new_status=OrderStatus.CONFIRMED.value, scope="filter", **form
+    )
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == detail
+    assert _statuses(db) == {order.id: OrderStatus.PENDING}
+
+
+@pytest.mark.usefixtures("database_mode")
+@pytest.mark.parametrize("notify", [True, False])
+def test_bulk_ready_for_pickup_notifies_customers(
+    db, monkeypatch, admin_client, make_batch, make_order, notify
+):
+    monkeypatch.setattr(email_service, "enabled", True)
+    batch = make_batch()
+    jan = make_order(batch, customer_email="jan@example.com")
+    without_email = make_order(batch)
+    already_ready = make_order(
+        batch, status=OrderStatus.READY_FOR_PICKUP, customer_email="mie@example.com"
+    )
+
+    form = {"notify": "true"} if notify else {}
+    response = _bulk_update(
+        admin_client,
+        new_status=OrderStatus.READY_FOR_PICKUP.value,
+        order_ids=[str(jan.id), str(without_email.id), str(already_ready.id)],
+        **form,
+    )
+
+    assert response.status_code == 303
+    assert response.headers["location"].endswith(
+        f"bulk_updated=2&bulk_notified={1 if notify else 0}"
+    )
+    outbox = db.query(EmailOutbox).all()
+    if notify:
+        assert [(email.to_email, email.subject) for email in outbox] == [
+            ("jan@example.com", f"Je bestelling #{jan.id} ligt klaar - Akkervarken.be"),
+        ]
+        assert "Najaar" in outbox[0].text_body
+    else:
+        assert outbox == []
+
+
+def _listed_ids(response):
+    return [
+        int(order_id)
+        for order_id in re.findall(r'name="order_ids" value="(\d+)"', response.text)
+    ]
+
+
+@pytest.mark.parametrize("limit", ["0", "501", "x"])
+def test_order_list_rejects_an_invalid_limit(admin_client, limit):
+    response = admin_client.get(f"/admin/orders?limit={limit}")
+
+    assert response.status_code == 422
+
+
+@pytest.mark.parametrize("cursor", ["after", "before"])
+def test_order_list_restarts_when_the_cursor_order_is_gone(
+    db, admin_client, make_batch, make_order, cursor
+):
+    batch = make_batch()
+    orders = [make_order(batch) for _ in range(3)]
+    gone = orders[1].id
+    db.delete(orders[1])
+    db.commit()
+
+    response = admin_client.get(f"/admin/orders?limit=1&{cursor}={gone}")
+
+    assert response.status_code == 200
+    assert _listed_ids(response) == [orders[2].id]
+    assert f"after={orders[2].id}" in response.text
+    assert "before=" not in response.text
+
+
+@pytest.mark.parametrize(
+    "sort, previous, following",
+    [
+        ("newest", "← Nieuwere", "Oudere →"),
+        ("total", "← Hogere bedragen", "Lagere bedragen →"),
+    ],
+)
+def test_order_list_pages_are_labelled_by_sort(
+    admin_client, make_batch, make_order, sort, previous, following
+):
+    batch = make_batch()
+    product = batch.products[0]
+    for quantity in (1, 2, 3):
+        make_order(batch, [(product, quantity)])
+
+    response = admin_client.get(f"/admin/orders?limit=1&sort={sort}")
+    (listed,) = _listed_ids(response)
+    response = admin_client.get(f"/admin/orders?limit=1&sort={sort}&after={listed}")
+
+    assert response.status_code == 200
+    assert previous in response.text
+    assert following in response.text
@@ -0,0 +1,171 @@
+"""Smoke tests for the async route handlers, with DATABASE_ASYNC off and on."""
+
+import pytest
+from sqlalchemy import event
+
+import database
+from models import Batch, BatchCapacity
+
+pytestmark = pytest.mark.usefixtures("database_mode")
+
+NEW_PRODUCT = {
+    "slug": "ribbetjes",
+    "name": "Ribbetjes",
+    "description": "Spareribs van het akkervarken",
+    "price": 14.0,
+    "weight_display": "per kg",
+}
+
+
+def _batch_form(slug, products, **fields):
+    form = {
+        "slug": slug,
+        "name": slug.capitalize(),
+        "pickup_location": "Boerderij",
+        "is_active": "true",
+        "product_ids": [str(product.id) for product in products],
+        "slot_dates": ["2026-01-17"],
+        "slot_times": ["10:00 - 12:00"],
+    }
+    form.update(fields)
+    return form
+
+
+def test_reads_use_the_selected_driver(database_mode, client, make_batch):
+    make_batch()
+    engines = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        engines.append(conn.dialect.is_async)
+
+    event.listen(database.engine, "before_cursor_execute", record)
+    try:
+        assert client.get("/api/batches").status_code == 200
+    finally:
+        event.remove(database.engine, "before_cursor_execute", record)
+
+    # The sync engine only sees the query when DATABASE_ASYNC is off
+    assert engines == ([False] if database_mode == "threadpool" else [])
+
+
+def test_product_routes(client, admin_client, make_batch):
+    make_batch()
+
+    catalog = client.get("/api/products/")
+    assert catalog.status_code == 200
+    assert [product["slug"] for product in catalog.json()] == ["gehakt", "spek", "worst"]
+    assert client.get("/api/products/spek").json()["price"] == 8.0
+    assert client.get("/api/products/ribbetjes").status_code == 404
+
+    created = admin_client.post("/api/products/", json=NEW_PRODUCT)
+    assert created.status_code == 201
+    assert admin_client.post("/api/products/", json=NEW_PRODUCT).status_code == 400
+    product_id = created.json()["id"]
+
+    updated = admin_client.put(f"/api/products/{product_id}", json={"price": 15.5})
+    assert updated.status_code == 200
+    assert updated.json()["price"] == 15.5
+    assert client.get("/api/products/ribbetjes").json()["price"] == 15.5
+
+    assert admin_client.delete(f"/api/products/{product_id}").status_code == 204
+    assert client.get("/api/products/ribbetjes").status_code == 404
+    assert len(client.get("/api/products/").json()) == 3
+
+
+def test_batch_routes(client, make_batch):
+    make_batch(capacities={"spek": 4})
+
+    batches = client.get("/api/batches")
+    assert batches.status_code == 200
+    assert [batch["slug"] for batch in batches.json()] == ["najaar"]
+
+    batch = client.get("/api/batches/najaar")
+    assert batch.status_code == 200
+    assert len(batch.json()["products"]) == 3
+    assert client.get("/api/batches/onbekend").status_code == 404
+
+    stock = client.get("/api/batches/najaar/availability")
+    assert stock.status_code == 200
+    assert {item["slug"]: item["remaining"] for item in stock.json()["products"]} == {
+        "gehakt": None,
+        "spek": 4,
+        "worst": None,
+    }
+    assert client.get("/api/batches/onbekend/availability").status_code == 404
+
+
+def test_batch_admin_routes(db, client, admin_client, make_batch):
+    products = make_batch().products
+
+    created = admin_client.post(
+        "/admin/batches",
+        data=_batch_form("winter", products, **{f"capacity_{products[1].id}": "6"}),
+        follow_redirects=False,
+    )
+    assert created.status_code == 303
+    assert [p["slug"] for p in client.get("/api/batches/winter").json()["products"]] == [
+        "gehakt",
+        "spek",
+        "worst",
+    ]
+    batch = db.query(Batch).filter(Batch.slug == "winter").one()
+    assert [(c.product_id, c.capacity) for c in batch.capacities] == [(products[1].id, 6)]
+    batch_id = batch.id
+
+    updated = admin_client.post(
+        f"/admin/batches/{batch_id}/update",
+        data=_batch_form("winter-2026", products[:1], name="Winter 2026"),
+        follow_redirects=False,
+    )
+    assert updated.status_code == 303
+    assert client.get("/api/batches/winter").status_code == 404
+    renamed = client.get("/api/batches/winter-2026").json()
+    assert renamed["name"] == "Winter 2026"
+    assert [p["slug"] for p in renamed["products"]] == ["gehakt"]
+
+    deleted = admin_client.post(f"/admin/batches/{batch_id}/delete", follow_redirects=False)
+    assert deleted.status_code == 303
+    assert client.get("/api/batches/winter-2026").status_code == 404
+    db.expire_all()
+    assert db.query(BatchCapacity).filter(BatchCapacity.batch_id == batch_id).count() == 0
+
+
+def test_order_routes(client, make_batch, place_order):
+    make_batch(capacities={"spek": 4})
+
+    created = place_order("najaar", {"spek": 2, "gehakt": 1})
+    assert created.status_code == 201
+    order_id = created.json()["order_id"]
+    assert place_order("najaar", {"spek": 3}).status_code == 409
+    assert place_order("najaar", {"ribbetjes": 1}).status_code == 400
+    newest_id = place_order("najaar", {"worst": 1}).json()["order_id"]
+
+    order = client.get(f"/api/orders/{order_id}")
+    assert order.status_code == 200
+    assert order.json()["total_amount"] == 2 * 8.0 + 12.5
+    assert order.json()["total_items"] == 3
+    assert client.get("/api/orders/999999").status_code == 404
+
+    first_page = client.get("/api/orders/?limit=1")
+    assert first_page.status_code == 200
+    assert [o["id"] for o in first_page.json()] == [newest_id]
+    assert 'rel="next"' in first_page.headers["link"]
+    second_page = client.get(f"/api/orders/?limit=1&after={newest_id}")
+    assert [o["id"] for o in second_page.json()] == [order_id]
+
+
+@pytest.mark.parametrize("cursor", ["after", "before"])
+def test_order_pages_restart_when_the_cursor_order_is_gone(
+    db, client, make_batch, make_order, cursor
+):
+    batch = make_batch()
+    orders = [make_order(batch) for _ in range(3)]
+    gone = orders[1].id
+    db.delete(orders[1])
+    db.commit()
+
+    response = client.get(f"/api/orders/?limit=1&{cursor}={gone}")
+
+    assert response.status_code == 200
+    assert [o["id"] for o in response.json()] == [orders[2].id]
+    assert response.headers["link"].endswith(f'after={orders[2].id}>; rel="next"')
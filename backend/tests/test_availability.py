@@ -0,0 +1,148 @@
+import asyncio
+import json
+
+import pytest
+from starlette.concurrency import run_in_threadpool
+
+import availability
+from availability import broadcaster
+from main import app
+
+
+def _remaining(document: dict) -> dict:
+    return {item["slug"]: item["remaining"] for item in document["products"]}
+
+
+class EventStream:
+    """Reads server-sent events from a GET request to the ASGI app.
+
+    TestClient buffers the whole response body, so the app is driven directly.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.status = None
+        self._messages: asyncio.Queue = asyncio.Queue()
+        self._disconnected = asyncio.Event()
+        self._buffer = b""
+        self._task = None
+
+    async def __aenter__(self) -> "EventStream":
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": self.path,
+            "raw_path": self.path.encode(),
+            "query_string": b"",
+            "root_path": "",
+            "headers": [(b"host", b"testserver"), (b"accept", b"text/event-stream")],
+            "client": ("testclient", 50000),
+            "server": ("testserver", 80),
+        }
+
+        async def receive():
+            await self._disconnected.wait()
+            return {"type": "http.disconnect"}
+
+        self._task = asyncio.create_task(app(scope, receive, self._messages.put))
+        start = await asyncio.wait_for(self._messages.get(), timeout=5)
+        self.status = start["status"]
+        self.headers = dict(start["headers"])
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self._disconnected.set()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+    async def next_event(self) -> dict:
+        """The next event as a dict of its fields, skipping comments."""
+        while True:
+            while b"\n\n" not in self._buffer:
+                message = await asyncio.wait_for(self._messages.get(), timeout=5)
+                self._buffer += message.get("body", b"")
+            raw, self._buffer = self._buffer.split(b"\n\n", 1)
+            fields = dict(
+                line.split(": ", 1)
+                for line in raw.decode().splitlines()
+                if not line.startswith(":")
+            )
+            if fields:
+                return fields
+
+
+@pytest.fixture
+def run_broadcaster(monkeypatch):
+    """Run a coroutine function with the broadcaster started, as on startup."""
+    monkeypatch.setattr(availability, "COALESCE_DELAY", 0.01)
+
+    def run(scenario):
+        async def main():
+            broadcaster.start()
+            try:
+                await scenario()
+            finally:
+                await broadcaster.stop()
+
+        asyncio.run(main())
+
+    return run
+
+
+def test_stream_sends_the_current_stock_then_every_change(
+    make_batch, place_order, run_broadcaster
+):
+    make_batch(capacities={"spek": 3})
+
+    async def scenario():
+        async with EventStream("/api/batches/najaar/availability/stream") as stream:
+            assert stream.status == 200
+            assert stream.headers[b"content-type"].startswith(b"text/event-stream")
+            assert await stream.next_event() == {"retry": "3000"}
+
+            event = await stream.next_event()
+            assert event["event"] == "availability"
+            assert _remaining(json.loads(event["data"])) == {
+                "gehakt": None,
+                "spek": 3,
+                "worst": None,
+            }
+
+            response = await run_in_threadpool(place_order, "najaar", {"spek": 2})
+            assert response.status_code == 201
+            document = json.loads((await stream.next_event())["data"])
+            assert _remaining(document)["spek"] == 1
+
+            await run_in_threadpool(place_order, "najaar", {"spek": 1})
+            document = json.loads((await stream.next_event())["data"])
+            spek = next(item for item in document["products"] if item["slug"] == "spek")
+            assert spek == {"slug": "spek", "remaining": 0, "sold_out": True}
+
+    run_broadcaster(scenario)
+
+
+def test_stream_of_an_unknown_batch_is_not_found(client):
+    response = client.get("/api/batches/onbekend/availability/stream")
+
+    assert response.status_code == 404
+
+
+def test_fallback_document_follows_orders(client, make_batch, place_order):
+    make_batch(capacities={"spek": 3})
+    first = client.get("/api/batches/najaar/availability")
+    assert _remaining(first.json())["spek"] == 3
+
+    place_order("najaar", {"spek": 2})
+    second = client.get(
+        "/api/batches/najaar/availability",
+        headers={"If-None-Match": first.headers["etag"]},
+    )
+
+    assert second.status_code == 200
+    assert _remaining(second.json())["spek"] == 1
@@ -0,0 +1,90 @@
+import re
+
+from models import BatchCapacity
+
+
+def _save_batch(admin_client, batch, limits):
+    """Submit the batch edit form with ``limits`` (product -> stock or "")."""
+    form = {
+        "slug": batch.slug,
+        "name": batch.name,
+        "pickup_location": batch.pickup_location,
+        "is_active": "true",
+        "product_ids": [str(product.id) for product in limits],
+        "slot_dates": ["2025-12-13"],
+        "slot_times": ["10:00 - 12:00"],
+    }
+    for product, limit in limits.items():
+        form[f"capacity_{product.id}"] = str(limit)
+    response = admin_client.post(
+        f"/admin/batches/{batch.id}/update", data=form, follow_redirects=False
+    )
+    assert response.status_code == 303, response.text
+
+
+def _capacity(db, batch, product):
+    db.expire_all()
+    return db.get(BatchCapacity, (batch.id, product.id))
+
+
+def test_orders_beyond_capacity_are_rejected(db, make_batch, place_order):
+    batch = make_batch(capacities={"spek": 3})
+    spek = next(product for product in batch.products if product.slug == "spek")
+
+    assert place_order("najaar", {"spek": 2}).status_code == 201
+    response = place_order("najaar", {"spek": 2, "gehakt": 1})
+
+    assert response.status_code == 409
+    assert response.json()["detail"] == "Niet genoeg voorraad: Spek (nog 1 beschikbaar)"
+    assert _capacity(db, batch, spek).reserved == 2
+
+
+def test_clearing_a_limit_keeps_reserved_units(db, admin_client, make_batch, place_order):
+    batch = make_batch(capacities={"spek": 3})
+    gehakt, spek, worst = batch.products
+    assert place_order("najaar", {"spek": 2}).status_code == 201
+
+    _save_batch(admin_client, batch, {gehakt: "", spek: "", worst: ""})
+    capacity = _capacity(db, batch, spek)
+    assert (capacity.capacity, capacity.reserved) == (None, 2)
+
+    # Unlimited now, but still counted
+    assert place_order("najaar", {"spek": 5}).status_code == 201
+    assert _capacity(db, batch, spek).reserved == 7
+
+    _save_batch(admin_client, batch, {gehakt: "", spek: 8, worst: ""})
+    assert place_order("najaar", {"spek": 2}).status_code == 409
+    assert place_order("najaar", {"spek": 1}).status_code == 201
+    capacity = _capacity(db, batch, spek)
+    assert (capacity.capacity, capacity.reserved) == (8, 8)
+
+
+def test_unchecking_a_product_keeps_reserved_units(
+    db, admin_client, make_batch, place_order
+):
+    batch = make_batch(capacities={"spek": 3})
+    gehakt, spek, worst = batch.products
+    assert place_order("najaar", {"spek": 2}).status_code == 201
+
+    _save_batch(admin_client, batch, {gehakt: "", worst: ""})
+    capacity = _capacity(db, batch, spek)
+    assert (capacity.capacity, capacity.reserved) == (None, 2)
+
+    _save_batch(admin_client, batch, {gehakt: "", spek: 3, worst: ""})
+    assert place_order("najaar", {"spek": 2}).status_code == 409
+    assert _capacity(db, batch, spek).reserved == 2
+
+
+def test_edit_form_shows_a_cleared_limit_as_empty(
+    db, admin_client, make_batch, place_order
+):
+    batch = make_batch(capacities={"spek": 3})
+    gehakt, spek, worst = batch.products
+    assert place_order("najaar", {"spek": 2}).status_code == 201
+    _save_batch(admin_client, batch, {gehakt: "", spek: "", worst: ""})
+
+    html = admin_client.get(f"/admin/batches/{batch.id}/edit").text
+
+    field = re.search(rf'name="capacity_{spek.id}"[^>]*value="([^"]*)"', html)
+    assert field.group(1) == ""
+    assert "2 besteld" in html
@@ -0,0 +1,200 @@
+import asyncio
+import socket
+import ssl
+from datetime import datetime, timedelta, timezone
+from email import message_from_bytes
+
+import pytest
+import trustme
+from aiosmtpd.controller import Controller
+from aiosmtpd.smtp import AuthResult
+
+import email_outbox
+from email_outbox import BACKOFF_BASE, OutboxDispatcher
+from email_service import email_service
+from models import EmailOutbox, EmailStatus
+
+SMTP_LOGIN = ("bestellingen@akkervarken.be", "geheim")
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class SMTPServer:
+    """aiosmtpd handler keeping the messages it receives.
+
+    ``failures`` makes the next deliveries fail with a temporary error.
+    """
+
+    def __init__(self):
+        self.messages = []
+        self.failures = 0
+        self.peers = set()
+
+    @property
+    def connections(self) -> int:
+        return len(self.peers)
+
+    def authenticate(self, server, session, envelope, mechanism, auth_data):
+        login = (auth_data.login.decode(), auth_data.password.decode())
+        return AuthResult(success=login == SMTP_LOGIN)
+
+    async def handle_DATA(self, server, session, envelope):
+        self.peers.add(session.peer)
+        if self.failures:
+            self.failures -= 1
+            return "451 Try again later"
+        self.messages.append(message_from_bytes(envelope.content))
+        return "250 OK"
+
+
+@pytest.fixture
+def smtp(monkeypatch, tmp_path):
+    """Enable email and send to an SMTP server on localhost.
+
+    Like a real mail provider, the server requires STARTTLS and a login. Its
+    certificate is issued by a throwaway CA the client is made to trust.
+    """
+    ca = trustme.CA()
+    tls_context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+    ca.issue_cert("127.0.0.1").configure_cert(tls_context)
+    ca_file = tmp_path / "ca.pem"
+    ca.cert_pem.write_to_path(str(ca_file))
+    monkeypatch.setenv("SSL_CERT_FILE", str(ca_file))
+
+    server = SMTPServer()
+    controller = Controller(
+        server,
+        hostname="127.0.0.1",
+        port=_free_port(),
+        tls_context=tls_context,
+        require_starttls=True,
+        authenticator=server.authenticate,
+    )
+    controller.start()
+
+    monkeypatch.setattr(email_service, "enabled", True)
+    monkeypatch.setattr(email_service, "smtp_host", "127.0.0.1")
+    monkeypatch.setattr(email_service, "smtp_port", controller.port)
+    monkeypatch.setattr(email_service, "smtp_user", SMTP_LOGIN[0])
+    monkeypatch.setattr(email_service, "smtp_password", SMTP_LOGIN[1])
+    monkeypatch.setattr(email_service, "from_email", "info@akkervarken.be")
+    monkeypatch.setattr(email_service, "_idle_connections", [])
+    yield server
+    controller.stop()
+
+
+def _drain(concurrency: int = email_outbox.CONCURRENCY) -> int:
+    """Deliver due emails, then close the pool as on shutdown."""
+
+    async def drain():
+        try:
+            return await OutboxDispatcher(concurrency).drain()
+        finally:
+            await email_service.close()
+
+    return asyncio.run(drain())
+
+
+def _outbox(db):
+    db.expire_all()
+    return db.query(EmailOutbox).order_by(EmailOutbox.id).all()
+
+
+def _as_utc(value: datetime) -> datetime:
+    # SQLite returns naive datetimes
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def test_no_emails_are_queued_without_smtp(db, make_batch, place_order):
+    make_batch()
+
+    response = place_order("najaar", {"spek": 1})
+
+    assert response.status_code == 201
+    assert response.json()["email_sent"] is False
+    assert _outbox(db) == []
+
+
+def test_order_emails_are_queued_and_delivered(db, smtp, make_batch, place_order):
+    make_batch()
+
+    response = place_order("najaar", {"spek": 2})
+    assert response.json()["email_sent"] is True
+    order_id = response.json()["order_id"]
+
+    entries = _outbox(db)
+    assert [entry.to_email for entry in entries] == [
+        "jan@example.com",
+        "admin@akkervarken.be",
+    ]
+    assert {entry.status for entry in entries} == {EmailStatus.PENDING.value}
+    assert smtp.messages == []
+
+    assert _drain(concurrency=1) == 2
+
+    received = sorted((message["To"], message["Subject"]) for message in smtp.messages)
+    assert received == [
+        ("admin@akkervarken.be", f"Nieuwe bestelling #{order_id} - Jan Janssens"),
+        ("jan@example.com", "Bevestiging bestelling - Akkervarken.be"),
+    ]
+    assert all(message["From"] == "info@akkervarken.be" for message in smtp.messages)
+    # Sent one after the other, both messages went over one pooled connection
+    assert smtp.connections == 1
+    for entry in _outbox(db):
+        assert entry.status == EmailStatus.SENT.value
+        assert entry.attempts == 1
+        assert entry.sent_at is not None
+
+
+def test_failed_delivery_is_retried_with_backoff(db, smtp, make_batch, place_order):
+    make_batch()
+    place_order("najaar", {"spek": 2}, customer_email=None)
+    smtp.failures = 1
+
+    before = datetime.now(timezone.utc)
+    assert _drain() == 1
+
+    (entry,) = _outbox(db)
+    assert entry.status == EmailStatus.PENDING.value
+    assert entry.attempts == 1
+    assert "Try again later" in entry.last_error
+    retry_at = _as_utc(entry.next_attempt_at)
+    assert before + BACKOFF_BASE <= retry_at <= datetime.now(timezone.utc) + BACKOFF_BASE
+
+    # Not due yet
+    assert _drain() == 0
+    assert smtp.messages == []
+
+    entry.next_attempt_at = before
+    db.commit()
+    assert _drain() == 1
+
+    (entry,) = _outbox(db)
+    assert entry.status == EmailStatus.SENT.value
+    assert entry.attempts == 2
+    assert entry.last_error is None
+    assert len(smtp.messages) == 1
+
+
+def test_delivery_gives_up_after_max_attempts(
+    db, smtp, monkeypatch, make_batch, place_order
+):
+    monkeypatch.setattr(email_outbox, "MAX_ATTEMPTS", 2)
+    make_batch()
+    place_order("najaar", {"spek": 2}, customer_email=None)
+    smtp.failures = 2
+
+    for _ in range(2):
+        assert _drain() == 1
+        (entry,) = _outbox(db)
+        entry.next_attempt_at = datetime.now(timezone.utc) - timedelta(seconds=1)
+        db.commit()
+
+    (entry,) = _outbox(db)
+    assert entry.status == EmailStatus.FAILED.value
+    assert entry.attempts == 2
+    assert _drain() == 0
@@ -0,0 +1,179 @@
+"""The order export must list exactly the orders the order list shows, and
+stream them in flat memory."""
+
+import csv
+import io
+import re
+import tracemalloc
+from datetime import datetime
+
+import pytest
+from sqlalchemy import insert
+
+from models import Order, OrderStatus
+from reports import (
+    CSV_BOM,
+    CSV_DELIMITER,
+    EXPORT_CHUNK_SIZE,
+    ORDER_EXPORT_HEADER,
+    export_order_rows,
+    stream_csv,
+)
+
+
+@pytest.fixture
+def orders(make_batch, make_order):
+    """Orders per key, over two batches, statuses and days around 2026-01-10."""
+    najaar = make_batch()
+    winter = make_batch("winter", prices={"ribbetjes": 14.0})
+    gehakt, spek, worst = najaar.products
+    created = {
+        "a": make_order(
+            najaar,
+            [(gehakt, 2), (spek, 1)],
+            customer_name="Jan Janssens",
+            customer_email="jan@example.com",
+            created_at=datetime(2026, 1, 9, 12, 0),
+        ),
+        "b": make_order(
+            najaar,
+            [(worst, 1)],
+            status=OrderStatus.CONFIRMED,
+            customer_name="Mie Peeters",
+            created_at=datetime(2026, 1, 10, 23, 30),
+        ),
+        "c": make_order(
+            najaar,
+            [(spek, 3)],
+            customer_name="Piet Maes",
+            created_at=datetime(2026, 1, 11, 0, 0),
+        ),
+        "d": make_order(
+            winter,
+            [(winter.products[0], 1)],
+            customer_name="Jan Janssens",
+            created_at=datetime(2026, 1, 10, 8, 0),
+        ),
+        "e": make_order(
+            najaar,
+            customer_name="An Aerts",
+            notes="Komt later",
+            created_at=datetime(2026, 1, 10, 10, 0),
+        ),
+    }
+    return {key: order.id for key, order in created.items()}
+
+
+def _csv_rows(response) -> list:
+    text = response.content.decode("utf-8")
+    assert text.startswith(CSV_BOM)
+    rows = list(csv.reader(io.StringIO(text[len(CSV_BOM):]), delimiter=CSV_DELIMITER))
+    assert rows[0] == list(ORDER_EXPORT_HEADER)
+    return rows[1:]
+
+
+def _listed_ids(response) -> set:
+    return {
+        int(order_id)
+        for order_id in re.findall(r'name="order_ids" value="(\d+)"', response.text)
+    }
+
+
+@pytest.mark.parametrize(
+    "filters, expected",
+    [
+        ("", "abcde"),
+        ("status_filter=pending", "acde"),
+        ("status_filter=onbekend", "abcde"),
+        ("batch_id=najaar", "abce"),
+        ("q=janssens", "ad"),
+        ("date_from=2026-01-10", "bcde"),
+        # date_to includes the whole day, up to 23:59
+        ("date_to=2026-01-10", "abde"),
+        ("date_from=2026-01-10&date_to=2026-01-10", "bde"),
+        ("batch_id=najaar&status_filter=pending&date_to=2026-01-10", "ae"),
+    ],
+)
+def test_csv_export_matches_the_order_list_filters(
+    admin_client, orders, filters, expected
+):
+    export = admin_client.get(f"/admin/orders/export?format=csv&{filters}")
+    listed = admin_client.get(f"/admin/orders?{filters}")
+
+    assert export.status_code == 200
+    exported = {int(row[0]) for row in _csv_rows(export)}
+    assert exported == {orders[key] for key in expected}
+    assert exported == _listed_ids(listed)
+
+
+def test_csv_export_has_a_row_per_item_oldest_first(admin_client, orders):
+    response = admin_client.get("/admin/orders/export?batch_id=najaar")
+
+    assert response.headers["content-type"].startswith("text/csv")
+    assert re.fullmatch(
+        r'attachment; filename="bestellingen-\d{4}-\d{2}-\d{2}\.csv"',
+        response.headers["content-disposition"],
+    )
+    rows = _csv_rows(response)
+    assert [int(row[0]) for row in rows] == [
+        orders["a"], orders["a"], orders["e"], orders["b"], orders["c"]
+    ]
+    assert all(re.fullmatch(r"\d{4}-\d{2}-\d{2} \d{2}:\d{2}", row[1]) for row in rows)
+    assert [row[2:4] + row[6:] for row in rows[:3]] == [
+        ["pending", "Jan Janssens", "najaar", "", "Gehakt", "2", "12,50", "25,00"],
+        ["pending", "Jan Janssens", "najaar", "", "Spek", "1", "8,00", "8,00"],
+        ["pending", "An Aerts", "najaar", "Komt later", "", "", "", ""],
+    ]
+    assert rows[0][4:6] == ["jan@example.com", ""]
+
+
+def test_xlsx_export_has_the_same_rows(admin_client, orders):
+    from openpyxl import load_workbook
+
+    csv_rows = _csv_rows(admin_client.get("/admin/orders/export?q=janssens"))
+    response = admin_client.get("/admin/orders/export?format=xlsx&q=janssens")
+
+    assert response.status_code == 200
+    sheet = load_workbook(io.BytesIO(response.content))["Bestellingen"]
+    rows = list(sheet.iter_rows(values_only=True))
+    assert rows[0] == ORDER_EXPORT_HEADER
+    assert [row[0] for row in rows[1:]] == [int(row[0]) for row in csv_rows]
+    assert rows[1][8:] == ("Gehakt", 2, 12.5, 25.0)
+
+
+def _export_peak(conditions) -> tuple:
+    """Rows and peak Python memory of a CSV export."""
+    tracemalloc.start()
+    try:
+        lines = stream_csv(ORDER_EXPORT_HEADER, export_order_rows(conditions))
+        return sum(1 for _ in lines) - 1, tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+@pytest.mark.postgres
+def test_export_memory_does_not_grow_with_the_orders(db, make_batch):
+    # Rows are fetched from a server-side cursor only on PostgreSQL
+    small, large = 2 * EXPORT_CHUNK_SIZE, 20 * EXPORT_CHUNK_SIZE
+    batch = make_batch()
+    db.execute(
+        insert(Order),
+        [
+            {
+                "customer_name": f"Klant {n}",
+                "batch_id": batch.slug,
+                "status": OrderStatus.PENDING,
+            }
+            for n in range(large)
+        ],
+    )
+    db.commit()
+    last_small_id = (
+        db.query(Order.id).order_by(Order.id).offset(small - 1).limit(1).scalar()
+    )
+
+    small_rows, small_peak = _export_peak([Order.id <= last_small_id])
+    large_rows, large_peak = _export_peak([])
+
+    assert (small_rows, large_rows) == (small, large)
+    assert large_peak < 2 * small_peak, f"{small_peak} vs {large_peak} bytes"
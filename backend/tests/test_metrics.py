@@ -0,0 +1,52 @@
+import asyncio
+import socket
+
+import pytest
+from aiosmtplib import SMTPConnectError
+from prometheus_client import REGISTRY
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+
+import database
+import metrics
+from email_service import email_service
+
+
+def _sample(name: str) -> float:
+    return REGISTRY.get_sample_value(name) or 0.0
+
+
+def _closed_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def test_failed_smtp_connections_are_counted(monkeypatch):
+    monkeypatch.setattr(email_service, "smtp_host", "127.0.0.1")
+    monkeypatch.setattr(email_service, "smtp_port", _closed_port())
+    monkeypatch.setattr(email_service, "from_email", "info@akkervarken.be")
+    monkeypatch.setattr(email_service, "_idle_connections", [])
+    failures = _sample("smtp_send_failures_total")
+    sends = _sample("smtp_send_duration_seconds_count")
+
+    with pytest.raises(SMTPConnectError):
+        asyncio.run(email_service.deliver("jan@example.com", "Test", "<p>Test</p>"))
+
+    assert _sample("smtp_send_failures_total") == failures + 1
+    assert _sample("smtp_send_duration_seconds_count") == sends + 1
+    assert email_service._idle_connections == []
+
+
+def test_failed_queries_leave_no_start_times_on_the_connection():
+    queries = _sample("db_query_duration_seconds_count")
+
+    with database.engine.connect() as conn:
+        for _ in range(3):
+            with pytest.raises(DBAPIError):
+                conn.execute(text("SELECT * FROM no_such_table"))
+            conn.rollback()
+        conn.execute(text("SELECT 1"))
+
+        assert conn.info[metrics._START_TIMES] == {}
+    assert _sample("db_query_duration_seconds_count") == queries + 1
@@ -0,0 +1,62 @@
+"""Orders keep the prices they were placed at when a product price changes."""
+
+import csv
+import io
+
+import pytest
+
+from reports import CSV_BOM, CSV_DELIMITER
+
+
+def _update_with_form(admin_client, product):
+    return admin_client.post(
+        f"/admin/products/{product.id}/update",
+        data={
+            "slug": product.slug,
+            "name": product.name,
+            "description": product.description,
+            "price": "99,00",
+            "weight_display": product.weight_display,
+        },
+        follow_redirects=False,
+    )
+
+
+def _update_with_api(admin_client, product):
+    return admin_client.put(f"/api/products/{product.id}", json={"price": 99.0})
+
+
+def _export_lines(admin_client) -> list:
+    """(product, quantity, unit price, subtotal) per exported order line."""
+    text = admin_client.get("/admin/orders/export?format=csv").content.decode("utf-8")
+    rows = list(csv.reader(io.StringIO(text[len(CSV_BOM):]), delimiter=CSV_DELIMITER))
+    return [tuple(row[8:]) for row in rows[1:]]
+
+
+@pytest.mark.parametrize("update", [_update_with_form, _update_with_api])
+def test_price_change_keeps_the_placed_order_prices(
+    client, admin_client, make_batch, place_order, update
+):
+    batch = make_batch()
+    (gehakt,) = [product for product in batch.products if product.slug == "gehakt"]
+    placed = place_order("najaar", {"gehakt": 2, "spek": 1})
+    assert placed.status_code == 201
+    order_id = placed.json()["order_id"]
+    before = client.get(f"/api/orders/{order_id}").json()
+    assert before["total_amount"] == 33.0
+
+    response = update(admin_client, gehakt)
+    assert response.status_code in (200, 303)
+    assert client.get("/api/products/gehakt").json()["price"] == 99.0
+
+    after = client.get(f"/api/orders/{order_id}").json()
+    assert after["total_amount"] == 33.0
+    assert [(item["unit_price"], item["subtotal"]) for item in after["items"]] == [
+        (12.5, 25.0),
+        (8.0, 8.0),
+    ]
+    assert after["items"] == before["items"]
+    assert _export_lines(admin_client) == [
+        ("Gehakt", "2", "12,50", "25,00"),
+        ("Spek", "1", "8,00", "8,00"),
+    ]
@@ -0,0 +1,123 @@
+"""Serializing orders must cost a fixed number of statements, however many
+orders and items are loaded (no lazy loads per row). So must placing an
+order, however many lines it has."""
+
+import pytest
+from sqlalchemy import event, insert
+
+import database
+from models import Order, OrderItem, OrderStatus
+from orders import ORDER_LOAD_PROFILES, query_orders
+from schemas import OrderResponse
+
+# Statements per profile: the orders (with their batch, and for "detail" their
+# items and products) plus one IN query per selectin relationship
+EXPECTED_STATEMENTS = {"list": 3, "detail": 2}
+
+
+@pytest.fixture
+def statements():
+    """SQL statements sent to the database while the test runs."""
+    recorded = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        recorded.append(statement)
+
+    event.listen(database.engine, "before_cursor_execute", record)
+    yield recorded
+    event.remove(database.engine, "before_cursor_execute", record)
+
+
+ORDER_COUNT = 500
+
+
+@pytest.fixture
+def orders(db, make_batch):
+    """Ids of orders of three lines each, alternating between two batches.
+
+    Bulk-inserted, so the largest page can be loaded without slow setup.
+    """
+    batches = [
+        make_batch(
+            slug, prices={f"{slug}-gehakt": 12.5, f"{slug}-spek": 8.0, f"{slug}-worst": 10.0}
+        )
+        for slug in ("najaar", "winter")
+    ]
+    db.execute(
+        insert(Order),
+        [
+            {
+                "customer_name": f"Klant {n}",
+                "batch_id": batches[n % 2].slug,
+                "status": OrderStatus.PENDING,
+            }
+            for n in range(ORDER_COUNT)
+        ],
+    )
+    order_ids = [order_id for order_id, in db.query(Order.id).order_by(Order.id)]
+    db.execute(
+        insert(OrderItem),
+        [
+            {
+                "order_id": order_id,
+                "product_id": product.id,
+                "quantity": n % 5 + 1,
+                "unit_price": product.price,
+                "subtotal": product.price * (n % 5 + 1),
+            }
+            for n, order_id in enumerate(order_ids)
+            for product in batches[n % 2].products
+        ],
+    )
+    db.commit()
+    return order_ids
+
+
+def test_every_profile_is_counted():
+    assert set(EXPECTED_STATEMENTS) == set(ORDER_LOAD_PROFILES)
+
+
+@pytest.mark.parametrize("profile", sorted(ORDER_LOAD_PROFILES))
+@pytest.mark.parametrize("count", [1, 50, ORDER_COUNT])
+def test_serializing_orders_uses_a_fixed_number_of_statements(
+    db, orders, statements, profile, count
+):
+    db.expire_all()
+    statements.clear()
+
+    loaded = query_orders(db, profile).order_by(Order.id).limit(count).all()
+    responses = [OrderResponse.model_validate(order) for order in loaded]
+
+    assert len(responses) == count
+    assert len(statements) == EXPECTED_STATEMENTS[profile], statements
+    assert all(len(response.items) == 3 for response in responses)
+    assert {response.batch_name for response in responses} == (
+        {"Najaar"} if count == 1 else {"Najaar", "Winter"}
+    )
+    assert all(response.pickup_info for response in responses)
+
+
+def test_order_api_statements_do_not_grow_with_the_page(client, orders, statements):
+    def statements_for(path):
+        statements.clear()
+        assert client.get(path).status_code == 200
+        return len(statements)
+
+    first_page = statements_for("/api/orders/?limit=1")
+    assert statements_for("/api/orders/?limit=50") == first_page
+    assert statements_for(f"/api/orders/?limit={ORDER_COUNT}") == first_page
+    assert statements_for(f"/api/orders/{orders[0]}") == EXPECTED_STATEMENTS["detail"]
+
+
+def test_placing_an_order_statements_do_not_grow_with_the_lines(
+    make_batch, place_order, statements
+):
+    slugs = [f"product-{n}" for n in range(10)]
+    make_batch(prices=dict.fromkeys(slugs, 5.0), capacities=dict.fromkeys(slugs, 100))
+
+    def statements_for(items):
+        statements.clear()
+        assert place_order("najaar", items).status_code == 201
+        return len(statements)
+
+    assert statements_for({slugs[0]: 1}) == statements_for(dict.fromkeys(slugs, 2))
@@ -0,0 +1,103 @@
+import pytest
+
+from models import Order
+from orders import order_search_condition
+
+CUSTOMERS = {
+    "jan": dict(
+        customer_name="Jan Janssens",
+        customer_email="jan@example.com",
+        customer_phone="+32 494 12 34 56",
+    ),
+    "mie": dict(
+        customer_name="Mie Peeters",
+        customer_email="mie.peeters@boerderij.be",
+        customer_phone="0471/98.76.54",
+    ),
+    "an": dict(
+        customer_name="An 100% Vlees_Fan",
+        customer_email="an@example.com",
+        customer_phone=None,
+    ),
+}
+
+
+@pytest.fixture
+def customers(make_batch, make_order):
+    """Order ids per customer, one order each."""
+    batch = make_batch()
+    return {key: make_order(batch, **fields).id for key, fields in CUSTOMERS.items()}
+
+
+def _search(db, term):
+    condition = order_search_condition(term)
+    assert condition is not None, term
+    return {order.id for order in db.query(Order).filter(condition)}
+
+
+@pytest.mark.parametrize(
+    "term, expected",
+    [
+        ("janssens", {"jan"}),
+        ("JAN", {"jan"}),
+        ("  peeters ", {"mie"}),
+        ("@example.com", {"jan", "an"}),
+        ("boerderij.be", {"mie"}),
+        ("onbekend", set()),
+    ],
+)
+def test_search_matches_part_of_the_name_or_email(db, customers, term, expected):
+    assert _search(db, term) == {customers[key] for key in expected}
+
+
+@pytest.mark.parametrize(
+    "term, expected",
+    [
+        ("0494 12 34 56", {"jan"}),
+        ("0494123456", {"jan"}),
+        ("+32494123456", {"jan"}),
+        ("494-12-34", {"jan"}),
+        ("0471 98 76 54", {"mie"}),
+        ("0471.98.76.54", {"mie"}),
+        ("98765", {"mie"}),
+    ],
+)
+def test_search_matches_phone_numbers_without_separators(db, customers, term, expected):
+    assert _search(db, term) == {customers[key] for key in expected}
+
+
+def test_search_matches_the_order_number(db, customers):
+    order_id = customers["mie"]
+
+    assert _search(db, f"#{order_id}") == {order_id}
+    assert order_id in _search(db, str(order_id))
+    assert _search(db, "#999999") == set()
+
+
+@pytest.mark.parametrize(
+    "term, expected",
+    [("100%", {"an"}), ("vlees_", {"an"}), ("n%v", set()), ("n_j", set())],
+)
+def test_search_wildcards_are_literal(db, customers, term, expected):
+    assert _search(db, term) == {customers[key] for key in expected}
+
+
+@pytest.mark.parametrize("term", ["", "  ", "ja", " a ", "#", "%_"])
+def test_search_needs_three_characters(term):
+    assert order_search_condition(term) is None
+
+
+def test_short_search_lists_all_orders_with_a_notice(admin_client, customers):
+    response = admin_client.get("/admin/orders?q=ja")
+
+    assert response.status_code == 200
+    assert "Geef minstens 3 tekens" in response.text
+    assert all(f"#{order_id}<" in response.text for order_id in customers.values())
+
+
+def test_search_filters_the_admin_order_list(admin_client, customers):
+    response = admin_client.get("/admin/orders?q=0471 98 76 54")
+
+    assert "Geef minstens 3 tekens" not in response.text
+    assert f"#{customers['mie']}<" in response.text
+    assert f"#{customers['jan']}<" not in response.text
@@ -0,0 +1,87 @@
+"""Parallel orders against limited stock must never sell more than the capacity.
+
+Runs on PostgreSQL only: SQLite has no SELECT ... FOR UPDATE, so it would not
+exercise the row locks in capacity.reserve_capacity.
+"""
+
+import random
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import func
+
+import database
+from models import BatchCapacity, Order, OrderItem
+from orders import _create_order
+from schemas import OrderCreate
+
+pytestmark = pytest.mark.postgres
+
+# Below DB_POOL_SIZE + DB_MAX_OVERFLOW, so no thread waits on the pool
+WORKERS = 12
+ORDERS = 240
+CAPACITY = 60
+
+
+def _orders(batch_slug: str, product_slugs: list) -> list:
+    """Orders for one or two products, with the lines in either order."""
+    rng = random.Random(19)
+    return [
+        OrderCreate(
+            customer_name=f"Klant {n}",
+            batch_id=batch_slug,
+            batch_name="Najaar",
+            items=[
+                {"product_slug": slug, "quantity": rng.randint(1, 3)}
+                for slug in rng.sample(product_slugs, k=rng.choice((1, 2)))
+            ],
+        )
+        for n in range(ORDERS)
+    ]
+
+
+def test_parallel_orders_never_oversell(db, make_batch):
+    batch = make_batch(capacities={"gehakt": CAPACITY, "spek": CAPACITY})
+    start = threading.Barrier(WORKERS)
+
+    def place(order_data: OrderCreate) -> int:
+        session = database.SessionLocal()
+        try:
+            _create_order(session, order_data)
+            return 201
+        except HTTPException as e:
+            return e.status_code
+        finally:
+            session.close()
+
+    def worker(orders: list) -> Counter:
+        start.wait()
+        return Counter(place(order_data) for order_data in orders)
+
+    orders = _orders(batch.slug, ["gehakt", "spek", "worst"])
+    with ThreadPoolExecutor(WORKERS) as pool:
+        statuses = sum(
+            pool.map(worker, [orders[i::WORKERS] for i in range(WORKERS)]), Counter()
+        )
+
+    # Deadlocks or lock timeouts would surface as 500s
+    assert set(statuses) == {201, 409}, statuses
+
+    db.expire_all()
+    sold = dict(
+        db.query(OrderItem.product_id, func.sum(OrderItem.quantity))
+        .join(Order, Order.id == OrderItem.order_id)
+        .filter(Order.batch_id == batch.slug)
+        .group_by(OrderItem.product_id)
+        .all()
+    )
+    rows = db.query(BatchCapacity).filter(BatchCapacity.batch_id == batch.id).all()
+    assert len(rows) == 2
+    for row in rows:
+        assert row.reserved <= row.capacity
+        assert row.reserved == sold[row.product_id]
+        # Far more was ordered than in stock, so every limited product sells out
+        assert row.reserved > CAPACITY - 3
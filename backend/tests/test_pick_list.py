@@ -0,0 +1,99 @@
+"""The pick list counts what is still to be picked up, per product."""
+
+import csv
+import io
+
+import pytest
+
+from models import OrderStatus
+from reports import CSV_BOM, CSV_DELIMITER, PICK_LIST_CSV_HEADER
+
+# Pieces per package and grams per piece; either may be unknown
+PACKAGING = {
+    "gehakt": (2, 250),
+    "pate": (None, None),
+    "spek": (None, 150),
+    "worst": (4, None),
+}
+
+# Product, units per status, units ordered, to pick, pieces, grams (by name)
+EXPECTED_LINES = [
+    # 3 active units: 3 × 2 pieces, 6 × 250 g
+    ("Gehakt", {"pending": 2, "confirmed": 1, "picked up": 5}, 8, 3, 6, 1500),
+    ("Pate", {"ready for pickup": 1}, 1, 1, None, None),
+    # No pieces per package: one piece per unit for the grams
+    ("Spek", {"pending": 1, "picked up": 2}, 3, 1, None, 150),
+    ("Worst", {"confirmed": 3}, 3, 3, 12, None),
+]
+
+
+@pytest.fixture
+def batch(db, make_batch, make_order):
+    """A batch with an order in every status, next to another batch's order."""
+    batch = make_batch(prices=dict.fromkeys(PACKAGING, 10.0))
+    products = {product.slug: product for product in batch.products}
+    for slug, (pieces, grams) in PACKAGING.items():
+        products[slug].packaging_pieces = pieces
+        products[slug].unit_grams = grams
+    db.commit()
+
+    gehakt, pate, spek, worst = (products[slug] for slug in sorted(PACKAGING))
+    make_order(batch, [(gehakt, 2), (spek, 1)])
+    make_order(batch, [(gehakt, 1), (worst, 3)], status=OrderStatus.CONFIRMED)
+    make_order(batch, [(pate, 1)], status=OrderStatus.READY_FOR_PICKUP)
+    make_order(batch, [(gehakt, 5), (spek, 2)], status=OrderStatus.PICKED_UP)
+    other = make_batch("winter", prices={"ribbetjes": 14.0})
+    make_order(other, [(other.products[0], 7)])
+    return batch
+
+
+def test_pick_list_json(admin_client, batch):
+    response = admin_client.get(f"/admin/batches/{batch.id}/pick-list?format=json")
+
+    assert response.status_code == 200
+    report = response.json()
+    assert report["orders"] == {
+        "pending": 1,
+        "confirmed": 1,
+        "ready for pickup": 1,
+        "picked up": 1,
+    }
+    assert [
+        (
+            line["product_name"],
+            {status: units for status, units in line["quantities"].items() if units},
+            line["ordered"],
+            line["to_pick"],
+            line["pieces"],
+            line["grams"],
+        )
+        for line in report["lines"]
+    ] == EXPECTED_LINES
+    assert (report["to_pick"], report["grams"]) == (8, 1650)
+
+
+def test_pick_list_csv(admin_client, batch):
+    response = admin_client.get(f"/admin/batches/{batch.id}/pick-list?format=csv")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    assert (
+        response.headers["content-disposition"]
+        == 'attachment; filename="paklijst-najaar.csv"'
+    )
+    text = response.content.decode("utf-8")
+    assert text.startswith(CSV_BOM)
+    rows = list(csv.reader(io.StringIO(text[len(CSV_BOM):]), delimiter=CSV_DELIMITER))
+    assert rows[0] == list(PICK_LIST_CSV_HEADER)
+    assert rows[1:] == [
+        [
+            name,
+            name.lower(),
+            *(str(quantities.get(status.value, 0)) for status in OrderStatus),
+            str(ordered),
+            str(to_pick),
+            "" if pieces is None else str(pieces),
+            "" if grams is None else str(grams),
+        ]
+        for name, quantities, ordered, to_pick, pieces, grams in EXPECTED_LINES
+    ]
@@ -0,0 +1,89 @@
+"""Every order listing access path must be served by an index.
+
+On PostgreSQL, EXPLAIN runs with sequential scans and sorts disabled for the
+session, so the planner reports whether an index *can* serve the query even
+on a near-empty test database. On SQLite (the default test database), EXPLAIN
+QUERY PLAN guards the composite indexes of the listing paths. Searching needs
+the PostgreSQL trigram indexes, so the search paths are only checked there.
+"""
+
+import pytest
+
+from models import ACTIVE_ORDER_STATUSES, Order, OrderStatus
+from orders import order_search_condition, query_orders
+
+NEWEST_FIRST = (Order.created_at.desc(), Order.id.desc())
+
+LISTING_PATHS = {
+    "all orders": lambda query: query.order_by(*NEWEST_FIRST),
+    "by batch": lambda query: query.filter(Order.batch_id == "najaar").order_by(
+        *NEWEST_FIRST
+    ),
+    "by status": lambda query: query.filter(Order.status == OrderStatus.PENDING).order_by(
+        *NEWEST_FIRST
+    ),
+    "by batch and status": lambda query: query.filter(
+        Order.batch_id == "najaar", Order.status == OrderStatus.PENDING
+    ).order_by(*NEWEST_FIRST),
+    "active orders per batch": lambda query: query.filter(
+        Order.batch_id == "najaar", Order.status.in_(ACTIVE_ORDER_STATUSES)
+    ).order_by(Order.created_at.desc()),
+}
+
+# Search results are few, so only index use matters, not their order
+SEARCH_PATHS = {
+    "search by name or email": lambda query: query.filter(
+        order_search_condition("janssens")
+    ),
+    "search by phone or id": lambda query: query.filter(order_search_condition("0494123")),
+}
+
+ACCESS_PATHS = {**LISTING_PATHS, **SEARCH_PATHS}
+
+
+def _sql(conn, query) -> str:
+    return str(
+        query.limit(100).statement.compile(
+            dialect=conn.dialect, compile_kwargs={"literal_binds": True}
+        )
+    )
+
+
+def _plan(db, query) -> list:
+    conn = db.connection()
+    conn.exec_driver_sql("SET LOCAL enable_seqscan = off")
+    conn.exec_driver_sql("SET LOCAL enable_sort = off")
+    return [row[0] for row in conn.exec_driver_sql(f"EXPLAIN {_sql(conn, query)}")]
+
+
+def _sqlite_plan(db, query) -> list:
+    conn = db.connection()
+    rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {_sql(conn, query)}")
+    return [row[3] for row in rows]
+
+
+@pytest.mark.postgres
+@pytest.mark.parametrize("path", sorted(ACCESS_PATHS))
+def test_order_listing_uses_an_index(db, path):
+    plan = _plan(db, ACCESS_PATHS[path](query_orders(db, "list")))
+    text = "\n".join(plan)
+
+    assert "Seq Scan on orders" not in text, text
+    assert not any(
+        line.strip().lstrip("-> ").startswith(("Sort ", "Incremental Sort "))
+        for line in plan
+    ), text
+
+
+@pytest.mark.parametrize("path", sorted(LISTING_PATHS))
+def test_order_listing_uses_an_index_on_sqlite(db, path):
+    if db.get_bind().dialect.name != "sqlite":
+        pytest.skip("SQLite query plans")
+    plan = _sqlite_plan(db, LISTING_PATHS[path](query_orders(db, "list")))
+    text = "\n".join(plan)
+
+    # "SCAN orders USING INDEX ..." walks an index in order; a bare scan does not
+    assert not any(
+        line.startswith("SCAN orders") and "USING" not in line for line in plan
+    ), text
+    assert not any("USE TEMP B-TREE FOR" in line for line in plan), text
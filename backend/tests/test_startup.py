@@ -0,0 +1,86 @@
+"""Cold start must stay within budget, like a Railway restart or scale-up.
+
+Each check starts a fresh interpreter with the test database settings and
+takes the median of a few runs. Override the budgets on slow machines with
+STARTUP_IMPORT_BUDGET_MS and STARTUP_BUDGET_MS.
+"""
+
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+IMPORT_BUDGET_MS = float(os.getenv("STARTUP_IMPORT_BUDGET_MS", "2000"))
+READY_BUDGET_MS = float(os.getenv("STARTUP_BUDGET_MS", "3000"))
+RUNS = 3
+
+# Only needed once an email is sent or an export is downloaded
+LAZY_MODULES = ("aiosmtplib", "openpyxl")
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _import_main() -> dict:
+    """Import time in milliseconds and the lazy modules that were loaded."""
+    code = (
+        "import json, sys, time\n"
+        "start = time.perf_counter()\n"
+        "import main\n"
+        "print(json.dumps({'ms': (time.perf_counter() - start) * 1000,"
+        f" 'loaded': [m for m in {LAZY_MODULES!r} if m in sys.modules]}}))\n"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def _ready_ms(timeout: float = 30.0) -> float:
+    """Milliseconds from spawning uvicorn until /health answers."""
+    port = _free_port()
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port)],
+        cwd=BACKEND_DIR,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1):
+                    return (time.perf_counter() - start) * 1000
+            except OSError:
+                time.sleep(0.02)
+        raise AssertionError(f"server did not answer /health within {timeout}s")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def test_import_stays_within_budget():
+    runs = [_import_main() for _ in range(RUNS)]
+
+    assert [run["loaded"] for run in runs] == [[]] * RUNS
+    median = statistics.median(run["ms"] for run in runs)
+    assert median <= IMPORT_BUDGET_MS, f"import main took {median:.0f} ms"
+
+
+def test_ready_to_serve_within_budget():
+    median = statistics.median(_ready_ms() for _ in range(RUNS))
+
+    assert median <= READY_BUDGET_MS, f"ready to serve after {median:.0f} ms"
@@ -186,6 +186,9 @@ function enableAllBatches() {
 function increaseQuantity(productId) {
     const input = document.getElementById(`qty-${productId}`);
     const current = parseInt(input.value) || 0;
+    if (current >= getRemaining(productId)) {
+        return;
+    }
     input.value = current + 1;
     updateQuantity(productId, input.value);
 }
@@ -669,6 +672,82 @@ function showManualFallback(encodedEmailBody, encodedSubject) {
     showMailtoFallback(emailBody, subject);
 }
 
+// Live stock: the API pushes the remaining units per product of a batch as
+// server-sent events. Without EventSource, or when the stream is refused, the
+// same document is fetched periodically instead.
+const AVAILABILITY_POLL_MS = 60000;
+// Show how many are left once stock gets this low
+const LOW_STOCK_THRESHOLD = 10;
+
+function getRemaining(productId) {
+    const product = document.querySelector(`[data-id="${productId}"]`);
+    const remaining = product ? product.dataset.remaining : undefined;
+    return remaining === undefined || remaining === '' ? Infinity : parseInt(remaining);
+}
+
+function applyAvailability(batchElement, availability) {
+    availability.products.forEach(item => {
+        const product = batchElement.querySelector(`.product[data-product-slug="${item.slug}"]`);
+        if (!product) return;
+
+        product.dataset.remaining = item.remaining === null ? '' : item.remaining;
+        product.classList.toggle('sold-out', item.sold_out);
+
+        let stock = product.querySelector('.stock');
+        if (!stock) {
+            stock = document.createElement('div');
+            stock.className = 'stock';
+            product.querySelector('.quantity-controls').before(stock);
+        }
+        if (item.sold_out) {
+            stock.textContent = 'Uitverkocht';
+        } else if (item.remaining !== null && item.remaining <= LOW_STOCK_THRESHOLD) {
+            stock.textContent = `Nog ${item.remaining} beschikbaar`;
+        } else {
+            stock.textContent = '';
+        }
+    });
+}
+
+async function pollAvailability(batchElement, url) {
+    try {
+        const response = await fetch(url);
+        // Batches the API does not know have no stock limits
+        if (response.status === 404) return;
+        if (response.ok) {
+            applyAvailability(batchElement, await response.json());
+        }
+    } catch (error) {
+        // Network error; try again on the next poll
+    }
+    setTimeout(() => pollAvailability(batchElement, url), AVAILABILITY_POLL_MS);
+}
+
+function watchAvailability(batchElement) {
+    const apiUrl = window.API_URL || 'https://api.akkervarken.be';
+    const url = `${apiUrl}/api/batches/${encodeURIComponent(batchElement.dataset.batchSlug)}/availability`;
+
+    if (!window.EventSource) {
+        pollAvailability(batchElement, url);
+        return;
+    }
+
+    const source = new EventSource(`${url}/stream`);
+    source.addEventListener('availability', event => {
+        applyAvailability(batchElement, JSON.parse(event.data));
+    });
+    source.addEventListener('error', () => {
+        // EventSource reconnects by itself, unless the stream was refused
+        if (source.readyState === EventSource.CLOSED) {
+            pollAvailability(batchElement, url);
+        }
+    });
+}
+
+document.addEventListener('DOMContentLoaded', function() {
+    document.querySelectorAll('.batch[data-batch-slug]').forEach(watchAvailability);
+});
+
 // Track view_item_list event when page loads
 document.addEventListener('DOMContentLoaded', function() {
     if (window.Analytics) {